@@ -0,0 +1,105 @@
+import random
+from pathlib import Path
+
+import pymupdf
+
+WORDS = """translation model layout document page section figure table result
+method analysis system data network performance memory process language text
+sample training evaluation accuracy baseline experiment parameter algorithm
+structure function value error measure approach feature output input layer
+attention context sequence token encoder decoder benchmark latency throughput
+the of and to in for with on by from as that is are was were be this which
+""".split()
+TERMS = ["Transformer", "BLEU", "GPU", "Neural Machine Translation", "KV cache"]
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    text = " ".join(rng.choice(WORDS) for _ in range(words))
+    if rng.random() < 0.3:
+        text += f" {rng.choice(TERMS)}"
+    return text[0].upper() + text[1:] + "."
+
+
+def paragraph(rng: random.Random, sentences: int) -> str:
+    return " ".join(sentence(rng, rng.randint(8, 20)) for _ in range(sentences))
+
+
+def fill(page: pymupdf.Page, rect: pymupdf.Rect, text: str, fontsize: float) -> None:
+    """Write ``text`` into ``rect``, dropping trailing sentences that overflow."""
+
+    while page.insert_textbox(rect, text, fontsize=fontsize) < 0 and ". " in text:
+        text = text.rsplit(". ", 1)[0] + "."
+
+
+def page_number(page: pymupdf.Page, pno: int) -> None:
+    rect = page.rect
+    page.insert_text((rect.width / 2, rect.height - 30), str(pno + 1), fontsize=9)
+
+
+def text_dense(doc: pymupdf.Document, pages: int, rng: random.Random) -> None:
+    """A4 pages filled with paragraphs of small text."""
+
+    for pno in range(pages):
+        page = doc.new_page(width=595, height=842)
+        y = 60
+        while y < 740:
+            rect = pymupdf.Rect(60, y, 535, y + 90)
+            fill(page, rect, paragraph(rng, 4), 9)
+            y += 100
+        page_number(page, pno)
+
+
+def slides(doc: pymupdf.Document, pages: int, rng: random.Random) -> None:
+    """Landscape slides with a title and a few short bullet points."""
+
+    for pno in range(pages):
+        page = doc.new_page(width=960, height=540)
+        fill(page, pymupdf.Rect(60, 40, 900, 110), sentence(rng, 5), 30)
+        for idx in range(rng.randint(3, 5)):
+            y = 150 + idx * 70
+            fill(page, pymupdf.Rect(90, y, 880, y + 60), f"- {sentence(rng, 9)}", 20)
+        page_number(page, pno)
+
+
+def multi_column(doc: pymupdf.Document, pages: int, rng: random.Random) -> None:
+    """Two-column pages of paragraphs, like a paper."""
+
+    for pno in range(pages):
+        page = doc.new_page(width=612, height=792)
+        fill(page, pymupdf.Rect(60, 40, 552, 70), sentence(rng, 8), 14)
+        for x0 in (50, 316):
+            y = 90
+            while y < 700:
+                rect = pymupdf.Rect(x0, y, x0 + 246, y + 120)
+                fill(page, rect, paragraph(rng, 3), 8)
+                y += 130
+        page_number(page, pno)
+
+
+# Generator and page count of each benchmark document
+DOCUMENTS = {
+    "text_dense": (text_dense, 20),
+    "slides": (slides, 30),
+    "multi_column": (multi_column, 20),
+    "large": (text_dense, 1000),
+}
+
+
+def generate_pdf(name: str, directory: Path, seed: int = 0) -> Path:
+    """Path of the benchmark document ``name``, generated on first use.
+
+    Documents are generated from a fixed seed so every run, and the stored
+    baseline, translate the same text.
+    """
+
+    path = Path(directory) / f"{name}.pdf"
+    if path.exists():
+        return path
+
+    generator, pages = DOCUMENTS[name]
+    path.parent.mkdir(parents=True, exist_ok=True)
+    doc = pymupdf.open()
+    generator(doc, pages, random.Random(seed))
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+    return path
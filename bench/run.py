@@ -0,0 +1,295 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import httpx
+
+from bench.pdfs import DOCUMENTS, generate_pdf
+from bench.server import MockServer
+from core.client.factory import create_client
+from core.config import load_config
+from core.extract import get_page_count
+from core.metrics import Trace, job_trace
+from core.shard import pdf_workers
+from core.summarize import summarize_doc
+from core.translate import atranslate_pdf_preserve_layout, translate_pdf_preserve_layout
+
+BENCH_DIR = Path(".cache/bench")
+SRC_LANG = "English"
+TGT_LANG = "Persian فارسی"
+
+# Metrics compared against the baseline, and whether higher is better
+COMPARED = {
+    "blocks_per_sec": True,
+    "pages_per_sec": True,
+    "seconds": False,
+    "first_page_seconds": False,
+    "requests": False,
+    "prompt_tokens": False,
+    "peak_rss_mb": False,
+}
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the pipelines against a local mock LLM server."
+    )
+    parser.add_argument(
+        "documents",
+        nargs="*",
+        help=f"Documents to benchmark, of {', '.join(DOCUMENTS)} (default: all but large)",
+    )
+    parser.add_argument(
+        "--provider",
+        choices=["ollama", "openai"],
+        default="ollama",
+        help="API the mock server is used through (default: ollama)",
+    )
+    parser.add_argument(
+        "--pipeline",
+        choices=["threads", "asyncio", "streaming"],
+        default="threads",
+        help="Translation pipeline to run (default: threads)",
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.05,
+        help="Seconds before the first token of each response (default: 0.05)",
+    )
+    parser.add_argument(
+        "--tokens-per-second",
+        type=float,
+        default=2000,
+        help="Generation speed of each response (default: 2000)",
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of requests failing with a 503 (default: 0)",
+    )
+    parser.add_argument(
+        "--slots",
+        type=int,
+        default=16,
+        help="Responses generated at once by the server (default: 16)",
+    )
+    parser.add_argument(
+        "--pdf-workers",
+        type=int,
+        help="Processes extracting and rendering pages (default: from the config)",
+    )
+    parser.add_argument(
+        "--config", type=Path, default=Path("config.yaml"), help="Config file"
+    )
+    parser.add_argument(
+        "--baseline",
+        type=Path,
+        default=BENCH_DIR / "baseline.json",
+        help="Results to compare against",
+    )
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Store the results as the new baseline",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Relative change counted as a regression (default: 0.2)",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=Path,
+        default=BENCH_DIR / "results.json",
+        help="File the results are written to",
+    )
+    return parser.parse_args(argv)
+
+
+def bench_config(config: dict, args: argparse.Namespace, url: str) -> dict:
+    """``config`` pointed at the mock server, with caches and checkpoints off."""
+
+    if args.pdf_workers is not None:
+        config = {**config, "pdf_workers": args.pdf_workers}
+    return {
+        **config,
+        "provider": args.provider,
+        "base_url": f"{url}/v1" if args.provider == "openai" else url,
+        "model": "bench",
+        "api_key": "bench",
+        "endpoints": None,
+        "cache_path": "",
+        "checkpoint_dir": "",
+        "streaming": args.pipeline == "streaming",
+        "retry_base_delay": 0.05,
+        "retry_max_delay": 1,
+    }
+
+
+def peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere
+    return rss / 2**20 if sys.platform == "darwin" else rss / 2**10
+
+
+def run_document(pdf_path: str, config: dict, pipeline: str, url: str) -> dict:
+    """Run each stage on ``pdf_path`` and time it, in a fresh process.
+
+    Stage times of the translation come from its trace, requests and
+    tokens are those the mock server at ``url`` served during it.
+    """
+
+    with open(pdf_path, "rb") as f:
+        pages = get_page_count(f)
+
+        # The markdown summary of the plain text pipeline
+        f.seek(0)
+        with job_trace(Trace("summarize_doc")) as doc_trace:
+            summarize_doc(
+                f,
+                create_client(config, tier="summarize"),
+                max_workers=int(config.get("max_concurrency", 4)),
+                chunk_tokens=int(config.get("summary_chunk_tokens", 2500)),
+                pdf_workers=pdf_workers(config),
+            )
+
+        f.seek(0)
+        with tempfile.TemporaryDirectory() as tmp:
+            output_path = str(Path(tmp) / "out.pdf")
+            httpx.post(f"{url}/bench/reset")
+            started = time.perf_counter()
+            with job_trace(Trace(pdf_path)) as trace:
+                if pipeline == "asyncio":
+                    stats = asyncio.run(
+                        atranslate_pdf_preserve_layout(
+                            f, output_path, config, SRC_LANG, TGT_LANG, 1, pages
+                        )
+                    )
+                else:
+                    stats = translate_pdf_preserve_layout(
+                        f, output_path, config, SRC_LANG, TGT_LANG, 1, pages
+                    )
+            seconds = time.perf_counter() - started
+    served = httpx.get(f"{url}/bench/stats").json()
+    stages = trace.stages()
+
+    return {
+        "pages": pages,
+        "blocks": stats["blocks"],
+        "skipped": stats.get("skipped", 0),
+        "seconds": seconds,
+        "first_page_seconds": stats["first_page_seconds"],
+        "blocks_per_sec": stats["blocks"] / seconds,
+        "pages_per_sec": pages / seconds,
+        "peak_rss_mb": peak_rss_mb(),
+        **served,
+        "stages": {
+            "extract_markdown": doc_trace.stages().get("extract_markdown", 0.0),
+            "summarize_doc": doc_trace.seconds,
+            **{name: sec for name, sec in stages.items() if name != "llm_request"},
+            # Summed over requests, which overlap when run concurrently
+            "llm_wait": stages.get("llm_request", 0.0),
+        },
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Metrics of ``results`` worse than ``baseline`` by more than ``tolerance``."""
+
+    regressions = []
+    for name, metrics in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for metric, higher_is_better in COMPARED.items():
+            old, new = base.get(metric), metrics.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append(f"{name}: {metric} {old:.4g} -> {new:.4g}")
+    return regressions
+
+
+def format_result(name: str, result: dict) -> str:
+    stages = ", ".join(f"{stage} {sec:.2f}s" for stage, sec in result["stages"].items())
+    return (
+        f"{name}: {result['pages']} pages, {result['blocks']} blocks "
+        f"in {result['seconds']:.2f}s, first page after "
+        f"{result['first_page_seconds']:.2f}s ({result['blocks_per_sec']:.1f} blocks/s, "
+        f"{result['pages_per_sec']:.2f} pages/s), {result['requests']} requests, "
+        f"{result['prompt_tokens']} prompt tokens, "
+        f"peak RSS {result['peak_rss_mb']:.0f} MB\n  {stages}"
+    )
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    names = args.documents or [name for name in DOCUMENTS if name != "large"]
+    unknown = [name for name in names if name not in DOCUMENTS]
+    if unknown:
+        print(f"Unknown documents: {', '.join(unknown)}", file=sys.stderr)
+        return 1
+    config = load_config(args.config)
+
+    server = MockServer(
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        error_rate=args.error_rate,
+        slots=args.slots,
+    )
+    server.start()
+    config = bench_config(config, args, server.url)
+
+    results = {}
+    try:
+        for name in names:
+            pdf_path = generate_pdf(name, BENCH_DIR / "pdfs")
+            # A fresh process per document, so peak RSS and warm-up are its own
+            with ProcessPoolExecutor(
+                max_workers=1, mp_context=multiprocessing.get_context("spawn")
+            ) as pool:
+                result = pool.submit(
+                    run_document, str(pdf_path), config, args.pipeline, server.url
+                ).result()
+            results[name] = result
+            print(format_result(name, result), flush=True)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(results, indent=2))
+
+    status = 0
+    if args.baseline.exists() and not args.save_baseline:
+        regressions = compare(
+            results, json.loads(args.baseline.read_text()), args.tolerance
+        )
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        if regressions:
+            status = 1
+        else:
+            print(f"No regressions against {args.baseline}")
+
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(results, indent=2))
+        print(f"Baseline saved to {args.baseline}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,318 @@
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from core.prompt import count_tokens
+
+# Sections of the prompts holding the text to answer, see core/prompt.py
+PROMPT_INPUT = re.compile(
+    r"### (Input|Text|Segments|Terms)\n(.*?)\n\s*### (Summary|Translations?)",
+    re.DOTALL,
+)
+MARKER = re.compile(r"^<<\d+>>$")
+WORD = re.compile(r"\S+")
+# Words with the whitespace following them, so streamed pieces keep newlines
+TOKEN = re.compile(r"\S+\s*")
+
+
+def mock_answer(prompt: str) -> str:
+    """A response of about the length the model would give to ``prompt``.
+
+    Translations keep the <<n>> markers of batched segments and glossary
+    requests get a ``term => translation`` line per term, so the responses
+    parse like real ones.
+    """
+
+    match = PROMPT_INPUT.search(prompt)
+    if match is None:
+        return "ok"
+    section, text = match.group(1), match.group(2)
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+
+    if section == "Terms":
+        return "\n".join(f"{term} => {term}" for term in lines)
+    if section == "Input":
+        # Summaries are about a quarter of their input
+        words = WORD.findall(text)
+        return " ".join(words[: max(1, len(words) // 4)])
+    return "\n".join(
+        line if MARKER.match(line) else WORD.sub("ترجمه", line) for line in lines
+    )
+
+
+def message_text(message: dict) -> str:
+    """Text of a chat message, whose content may be a list of parts."""
+
+    content = message.get("content") or ""
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content)
+    return content
+
+
+class MockStats:
+    """Counters of the requests served, shared by the handler threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.requests = 0
+            self.errors = 0
+            self.prompt_tokens = 0
+            self.completion_tokens = 0
+            self.busy_seconds = 0.0
+
+    def record(self, prompt_tokens: int, completion_tokens: int, seconds: float):
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.busy_seconds += seconds
+
+    def record_error(self) -> None:
+        with self._lock:
+            self.requests += 1
+            self.errors += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "server_busy_seconds": self.busy_seconds,
+            }
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "MockServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: dict) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _start_chunked(self, content_type: str) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _write_chunk(self, data: str) -> None:
+        payload = data.encode()
+        self.wfile.write(f"{len(payload):x}\r\n".encode() + payload + b"\r\n")
+        self.wfile.flush()
+
+    def _end_chunked(self) -> None:
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        model = self.server.model
+        if self.path == "/bench/stats":
+            self._send_json(200, self.server.stats.snapshot())
+        elif self.path.rstrip("/").endswith("/api/tags"):
+            self._send_json(200, {"models": [{"name": model, "model": model}]})
+        elif self.path.rstrip("/").endswith("/models"):
+            self._send_json(
+                200,
+                {
+                    "object": "list",
+                    "data": [
+                        {
+                            "id": model,
+                            "object": "model",
+                            "created": 0,
+                            "owned_by": "bench",
+                        }
+                    ],
+                },
+            )
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+
+        if self.path == "/bench/reset":
+            self.server.stats.reset()
+            self._send_json(200, {})
+            return
+        if self.path.endswith("/api/chat"):
+            api = "ollama"
+        elif self.path.endswith("/chat/completions"):
+            api = "openai"
+        else:
+            self._send_json(404, {"error": "not found"})
+            return
+
+        server = self.server
+        if server.error_rate and random.random() < server.error_rate:
+            server.stats.record_error()
+            self._send_json(503, {"error": "mock server overloaded"})
+            return
+
+        prompt = "\n".join(
+            message_text(message) for message in request.get("messages", [])
+        )
+        prompt_tokens = count_tokens(prompt)
+        answer = mock_answer(prompt)
+        words = TOKEN.findall(answer) or [answer]
+        stream = request.get("stream", api == "ollama")
+
+        # Generation slots, requests past them queue like on a busy GPU
+        with server.slots:
+            started = time.perf_counter()
+            time.sleep(server.latency)
+            if stream:
+                self._stream(api, request.get("model", server.model), words)
+            else:
+                time.sleep(len(words) / server.tokens_per_second)
+                self._reply(
+                    api, request.get("model", server.model), answer, prompt_tokens
+                )
+            seconds = time.perf_counter() - started
+
+        server.stats.record(prompt_tokens, len(words), seconds)
+
+    def _reply(self, api: str, model: str, answer: str, prompt_tokens: int) -> None:
+        completion_tokens = len(WORD.findall(answer))
+        if api == "ollama":
+            self._send_json(
+                200,
+                {
+                    "model": model,
+                    "message": {"role": "assistant", "content": answer},
+                    "done": True,
+                    "done_reason": "stop",
+                    "prompt_eval_count": prompt_tokens,
+                    "eval_count": completion_tokens,
+                },
+            )
+            return
+        self._send_json(
+            200,
+            {
+                "id": "chatcmpl-bench",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": answer},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            },
+        )
+
+    def _stream(self, api: str, model: str, words: list[str]) -> None:
+        server = self.server
+        if api == "ollama":
+            self._start_chunked("application/x-ndjson")
+        else:
+            self._start_chunked("text/event-stream")
+
+        # A few words per chunk, at the configured generation speed
+        step = 8
+        for idx in range(0, len(words), step):
+            part = words[idx : idx + step]
+            time.sleep(len(part) / server.tokens_per_second)
+            content = "".join(part)
+            if api == "ollama":
+                chunk = {
+                    "model": model,
+                    "message": {"role": "assistant", "content": content},
+                    "done": False,
+                }
+                self._write_chunk(json.dumps(chunk) + "\n")
+            else:
+                chunk = {
+                    "id": "chatcmpl-bench",
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [
+                        {
+                            "index": 0,
+                            "delta": {"content": content},
+                            "finish_reason": None,
+                        }
+                    ],
+                }
+                self._write_chunk(f"data: {json.dumps(chunk)}\n\n")
+
+        if api == "ollama":
+            done = {
+                "model": model,
+                "message": {"role": "assistant", "content": ""},
+                "done": True,
+                "done_reason": "stop",
+                "eval_count": len(words),
+            }
+            self._write_chunk(json.dumps(done) + "\n")
+        else:
+            self._write_chunk("data: [DONE]\n\n")
+        self._end_chunked()
+
+
+class MockServer(ThreadingHTTPServer):
+    """Local stand-in for an Ollama or OpenAI-compatible chat endpoint.
+
+    Both APIs are served on the same port: ``/api/chat`` and ``/api/tags``
+    for Ollama, ``/v1/chat/completions`` and ``/v1/models`` for OpenAI.
+    The counters of the requests served are read from ``/bench/stats`` and
+    cleared with a POST to ``/bench/reset``.
+    Each response starts after ``latency`` seconds and is generated at
+    ``tokens_per_second``, at most ``slots`` at a time, and ``error_rate``
+    of the requests fail with a 503.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        port: int = 0,
+        model: str = "bench",
+        latency: float = 0.0,
+        tokens_per_second: float = 1000.0,
+        error_rate: float = 0.0,
+        slots: int = 64,
+    ):
+        super().__init__(("127.0.0.1", port), MockHandler)
+        self.model = model
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.slots = threading.BoundedSemaphore(max(1, slots))
+        self.stats = MockStats()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> threading.Thread:
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,251 @@
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import IO
+
+from core.cache import open_summary_cache, open_translation_memory
+from core.config import load_config
+from core.extract import PDF_LOCK, get_page_count
+from core.metrics import Trace, job_trace, serve_metrics
+from core.translate import (
+    atranslate_pdf_preserve_layout,
+    translate_pdf_preserve_layout,
+)
+
+logger = logging.getLogger("pdf_translator")
+
+
+def locked_page_count(pdf_file: IO[bytes]) -> int:
+    with PDF_LOCK:
+        return get_page_count(pdf_file)
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Translate PDFs while preserving their layout."
+    )
+    parser.add_argument("input", type=Path, help="PDF file or directory of PDFs")
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=Path,
+        default=Path("translated"),
+        help="Output directory (default: translated)",
+    )
+    parser.add_argument("--src", default="English", help="Source language")
+    parser.add_argument("--tgt", default="Persian فارسی", help="Target language")
+    parser.add_argument("--start", type=int, default=1, help="First page, 1-indexed")
+    parser.add_argument("--end", type=int, help="Last page (default: last page)")
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=2,
+        help="Number of documents translated concurrently (default: 2)",
+    )
+    parser.add_argument(
+        "--asyncio",
+        action="store_true",
+        help="Drive every document from one asyncio event loop instead of threads",
+    )
+    parser.add_argument(
+        "--trace",
+        action="store_true",
+        help="Write a JSON trace of the stages and requests of each document",
+    )
+    parser.add_argument(
+        "--config", type=Path, default=Path("config.yaml"), help="Config file"
+    )
+    return parser.parse_args(argv)
+
+
+def find_pdfs(path: Path) -> list[Path]:
+    if path.is_dir():
+        return sorted(p for p in path.iterdir() if p.suffix.lower() == ".pdf")
+    return [path]
+
+
+def translate_file(
+    pdf_path: Path,
+    output_path: Path,
+    config: dict,
+    args: argparse.Namespace,
+    cache=None,
+    summary_cache=None,
+) -> dict:
+    """Translate one PDF and return its throughput stats."""
+
+    started = time.perf_counter()
+    trace = Trace(pdf_path.name)
+    try:
+        with job_trace(trace), open(pdf_path, "rb") as f:
+            page_count = locked_page_count(f)
+            f.seek(0)
+
+            end_page = min(args.end or page_count, page_count)
+            stats = translate_pdf_preserve_layout(
+                f,
+                str(output_path),
+                config,
+                args.src,
+                args.tgt,
+                args.start,
+                end_page,
+                cache=cache,
+                summary_cache=summary_cache,
+            )
+    finally:
+        if args.trace:
+            trace.write(output_path.with_suffix(".trace.json"))
+
+    stats["seconds"] = time.perf_counter() - started
+    return stats
+
+
+async def atranslate_file(
+    pdf_path: Path,
+    output_path: Path,
+    config: dict,
+    args: argparse.Namespace,
+    cache=None,
+    summary_cache=None,
+) -> dict:
+    """Async version of ``translate_file``."""
+
+    started = time.perf_counter()
+    trace = Trace(pdf_path.name)
+    try:
+        # File I/O, and PyMuPDF waiting on other jobs for PDF_LOCK, stays
+        # off the loop
+        pdf_file = await asyncio.to_thread(open, pdf_path, "rb")
+        with job_trace(trace), pdf_file as f:
+            page_count = await asyncio.to_thread(locked_page_count, f)
+            f.seek(0)
+
+            end_page = min(args.end or page_count, page_count)
+            stats = await atranslate_pdf_preserve_layout(
+                f,
+                str(output_path),
+                config,
+                args.src,
+                args.tgt,
+                args.start,
+                end_page,
+                cache=cache,
+                summary_cache=summary_cache,
+            )
+    finally:
+        if args.trace:
+            await asyncio.to_thread(trace.write, output_path.with_suffix(".trace.json"))
+
+    stats["seconds"] = time.perf_counter() - started
+    return stats
+
+
+async def atranslate_all(
+    pdfs: list[Path],
+    config: dict,
+    args: argparse.Namespace,
+    cache=None,
+    summary_cache=None,
+) -> int:
+    """Translate ``pdfs`` on one event loop and return the number of failures."""
+
+    semaphore = asyncio.Semaphore(max(1, args.jobs))
+    failed = 0
+
+    async def run(pdf: Path) -> None:
+        nonlocal failed
+        async with semaphore:
+            try:
+                stats = await atranslate_file(
+                    pdf, args.output / pdf.name, config, args, cache, summary_cache
+                )
+                print(format_stats(pdf.name, stats), flush=True)
+            except Exception:
+                # One failed document doesn't stop the batch
+                failed += 1
+                logger.exception("%s: failed", pdf.name)
+
+    await asyncio.gather(*(run(pdf) for pdf in pdfs))
+    return failed
+
+
+def format_stats(name: str, stats: dict) -> str:
+    seconds = max(stats["seconds"], 1e-9)
+    return (
+        f"{name}: {stats['pages']} pages, {stats['blocks']} blocks "
+        f"in {stats['seconds']:.1f}s "
+        f"({stats['blocks'] / seconds:.2f} blocks/s, "
+        f"{stats['pages'] / seconds:.2f} pages/s, "
+        f"{stats.get('render_seconds_per_page', 0):.3f}s rendering per page, "
+        f"first page after {stats.get('first_page_seconds', 0):.1f}s, "
+        f"{stats.get('skipped', 0)} blocks skipped)"
+    )
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    config = load_config(args.config)
+    # Failed documents are reported on stderr with their traceback
+    logging.basicConfig(format="%(message)s")
+
+    pdfs = find_pdfs(args.input)
+    if not pdfs:
+        print(f"No PDF files found in {args.input}", file=sys.stderr)
+        return 1
+
+    args.output.mkdir(parents=True, exist_ok=True)
+    if int(config.get("metrics_port", 0)):
+        serve_metrics(int(config["metrics_port"]))
+
+    # One translation memory and summary cache shared by every document
+    cache = open_translation_memory(config)
+    summary_cache = open_summary_cache(config)
+
+    failed = 0
+    started = time.perf_counter()
+    if args.asyncio:
+        failed = asyncio.run(atranslate_all(pdfs, config, args, cache, summary_cache))
+    else:
+        with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+            futures = {
+                executor.submit(
+                    translate_file,
+                    pdf,
+                    args.output / pdf.name,
+                    config,
+                    args,
+                    cache,
+                    summary_cache,
+                ): pdf
+                for pdf in pdfs
+            }
+            for future in as_completed(futures):
+                pdf = futures[future]
+                try:
+                    print(format_stats(pdf.name, future.result()), flush=True)
+                except Exception:
+                    failed += 1
+                    logger.exception("%s: failed", pdf.name)
+
+    print(
+        f"Translated {len(pdfs) - failed}/{len(pdfs)} documents in "
+        f"{time.perf_counter() - started:.1f}s"
+    )
+    if cache is not None:
+        hits, misses = cache.hits, cache.misses
+        print(f"Translation memory: {hits} hits, {misses} misses")
+        cache.close()
+    if summary_cache is not None:
+        summary_cache.close()
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,239 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import IO
+
+from core import metrics
+from core.prompt import PROMPT_VERSION
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+
+def content_hash(*parts: str) -> str:
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def file_fingerprint(pdf_file: IO[bytes]) -> str:
+    """Hash the contents of ``pdf_file`` and rewind it."""
+
+    h = hashlib.sha256()
+    pdf_file.seek(0)
+    for block in iter(lambda: pdf_file.read(1 << 20), b""):
+        h.update(block)
+    pdf_file.seek(0)
+    return h.hexdigest()
+
+
+def translation_key(
+    chunk: str,
+    summary: str,
+    source_lang: str,
+    target_lang: str,
+    model: str,
+    glossary: str = "",
+) -> str:
+    parts = [
+        normalize_text(chunk),
+        source_lang,
+        target_lang,
+        model,
+        PROMPT_VERSION,
+        content_hash(summary),
+    ]
+    if glossary:
+        parts.append(content_hash(glossary))
+    return content_hash(*parts)
+
+
+class TranslationMemory:
+    """SQLite-backed translation memory with LRU eviction.
+
+    Entries are keyed by ``translation_key``. Once the store grows past
+    ``max_entries`` the least recently used translations are dropped. Hits
+    update ``last_used`` in batches of ``touch_interval``, and on close.
+    """
+
+    evict_interval = 100
+    touch_interval = 100
+
+    def __init__(self, path: str | Path, max_entries: int = 100_000):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        # Last use of the keys hit since the last batch of updates
+        self._touched: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS translations (
+                key TEXT PRIMARY KEY,
+                translation TEXT NOT NULL,
+                last_used REAL NOT NULL
+            )"""
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS translations_last_used "
+            "ON translations (last_used)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT translation FROM translations WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                metrics.count("cache_lookups_total", cache="translation", result="miss")
+                return None
+
+            self.hits += 1
+            metrics.count("cache_lookups_total", cache="translation", result="hit")
+            self._touched[key] = time.time()
+            if len(self._touched) >= self.touch_interval:
+                self._touch()
+                self._conn.commit()
+            return row[0]
+
+    def put(self, key: str, translation: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO translations VALUES (?, ?, ?)",
+                (key, translation, time.time()),
+            )
+            self._touched.pop(key, None)
+            self._puts += 1
+            if self._puts % self.evict_interval == 0:
+                self._evict()
+            self._conn.commit()
+
+    def _touch(self) -> None:
+        self._conn.executemany(
+            "UPDATE translations SET last_used = ? WHERE key = ?",
+            [(used, key) for key, used in self._touched.items()],
+        )
+        self._touched.clear()
+
+    def _evict(self) -> None:
+        # Recent hits count as used, so they are not evicted
+        self._touch()
+        self._conn.execute(
+            """DELETE FROM translations WHERE key IN (
+                SELECT key FROM translations
+                ORDER BY last_used DESC LIMIT -1 OFFSET ?
+            )""",
+            (self.max_entries,),
+        )
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+    def close(self) -> None:
+        with self._lock:
+            self._evict()
+            self._conn.commit()
+            self._conn.close()
+
+
+class SummaryCache:
+    """SQLite-backed cache of document and chunk summaries.
+
+    Entries older than ``ttl`` seconds are treated as missing and evicted.
+    """
+
+    def __init__(self, path: str | Path, ttl: float = 7 * 24 * 3600):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        # Shares its file with the translation memory, WAL lets both write
+        # without readers blocking them
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS summaries (
+                key TEXT PRIMARY KEY,
+                summary TEXT NOT NULL,
+                created REAL NOT NULL
+            )"""
+        )
+        self._conn.commit()
+        with self._lock:
+            self._evict()
+            self._conn.commit()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary FROM summaries WHERE key = ? AND created >= ?",
+                (key, time.time() - self.ttl),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                metrics.count("cache_lookups_total", cache="summary", result="miss")
+                return None
+
+            self.hits += 1
+            metrics.count("cache_lookups_total", cache="summary", result="hit")
+            return row[0]
+
+    def put(self, key: str, summary: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO summaries VALUES (?, ?, ?)",
+                (key, summary, time.time()),
+            )
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        self._conn.execute(
+            "DELETE FROM summaries WHERE created < ?", (time.time() - self.ttl,)
+        )
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def open_translation_memory(config: dict) -> TranslationMemory | None:
+    """Open the translation memory configured by ``cache_path``, if any."""
+
+    path = config.get("cache_path")
+    if not path:
+        return None
+    return TranslationMemory(
+        path, max_entries=int(config.get("cache_max_entries", 100_000))
+    )
+
+
+def open_summary_cache(config: dict) -> SummaryCache | None:
+    """Open the summary cache, a table in the translation memory's ``cache_path``.
+
+    Returns None when no ``cache_path`` is configured.
+    """
+
+    path = config.get("cache_path")
+    if not path:
+        return None
+    return SummaryCache(path, ttl=float(config.get("summary_cache_ttl", 7 * 24 * 3600)))
@@ -0,0 +1,109 @@
+import sqlite3
+import threading
+import weakref
+from pathlib import Path
+from typing import IO
+
+from core.cache import content_hash, file_fingerprint
+from core.prompt import PROMPT_VERSION
+
+SUMMARY_KEY = "summary"
+
+# Checkpoints open in this process, so identical jobs running at the same
+# time don't write to, and then delete, the same file. Pipelines close their
+# checkpoint when they fail, held weakly in case a caller drops one unclosed.
+_open_checkpoints: weakref.WeakValueDictionary = weakref.WeakValueDictionary()
+_open_checkpoints_lock = threading.Lock()
+
+
+class Checkpoint:
+    """Per-job SQLite store of finished results, so a rerun can resume.
+
+    Block translations are stored under their ``translation_key`` as soon as
+    they finish, and the document summary under ``SUMMARY_KEY``.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.resumed = 0
+        self.closed = False
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            )"""
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM results WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        self.resumed += 1
+        return row[0]
+
+    def put(self, key: str, value: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?)", (key, value)
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+            self.closed = True
+
+    def remove(self) -> None:
+        """Close the checkpoint and delete it once the job has finished."""
+
+        self.close()
+        for suffix in ("", "-wal", "-shm"):
+            Path(f"{self.path}{suffix}").unlink(missing_ok=True)
+
+
+def open_checkpoint(
+    config: dict,
+    pdf_file: IO[bytes],
+    src_lang: str,
+    tgt_lang: str,
+    start_page: int,
+    end_page: int,
+    model: str,
+) -> Checkpoint | None:
+    """Open the checkpoint of this job under ``checkpoint_dir``, if configured.
+
+    Jobs on the same input with the same settings and ``model`` share a
+    checkpoint. While one of them is running the others get None.
+    """
+
+    directory = config.get("checkpoint_dir")
+    if not directory:
+        return None
+
+    job_id = content_hash(
+        file_fingerprint(pdf_file),
+        src_lang,
+        tgt_lang,
+        str(start_page),
+        str(end_page),
+        model,
+        PROMPT_VERSION,
+    )
+    path = Path(directory) / f"{job_id}.db"
+    with _open_checkpoints_lock:
+        running = _open_checkpoints.get(path)
+        if running is not None and not running.closed:
+            return None
+        checkpoint = Checkpoint(path)
+        _open_checkpoints[path] = checkpoint
+        return checkpoint
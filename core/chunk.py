@@ -0,0 +1,94 @@
+import re
+
+from core.extract import Block
+from core.prompt import count_tokens
+
+SENTENCE_END = re.compile(r"(?<=[.!?;:؟۔。！？])\s+|\n{2,}")
+
+
+def split_text(text: str, max_tokens: int, model: str | None = None) -> list[str]:
+    """Split ``text`` at sentence boundaries into pieces of up to ``max_tokens``.
+
+    Sentences longer than the budget are split between words.
+    """
+
+    if max_tokens <= 0 or count_tokens(text, model) <= max_tokens:
+        return [text]
+
+    units = []
+    for sentence in SENTENCE_END.split(text):
+        if not sentence.strip():
+            continue
+        if count_tokens(sentence, model) <= max_tokens:
+            units.append(sentence)
+        else:
+            units.extend(sentence.split())
+
+    return pack_texts(units, max_tokens, model, sep=" ")
+
+
+def pack_texts(
+    texts: list[str], max_tokens: int, model: str | None = None, sep: str = "\n\n"
+) -> list[str]:
+    """Join consecutive texts into chunks of up to ``max_tokens`` tokens.
+
+    Texts larger than the budget on their own make a chunk by themselves.
+    """
+
+    chunks = []
+    current: list[str] = []
+    current_tokens = 0
+
+    for text in texts:
+        tokens = count_tokens(text, model)
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(sep.join(current))
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += tokens
+
+    if current:
+        chunks.append(sep.join(current))
+    return chunks
+
+
+def chunk_blocks(
+    blocks: list[Block], max_tokens: int, model: str | None = None
+) -> list[str]:
+    """Pack consecutive block texts into chunks of up to ``max_tokens`` tokens.
+
+    Blocks larger than the budget are split at sentence boundaries first.
+    """
+
+    texts = []
+    for block in blocks:
+        texts.extend(split_text(block.text, max_tokens, model))
+    return pack_texts(texts, max_tokens, model)
+
+
+def split_chunks(
+    chunks: list[str], max_tokens: int, model: str | None = None
+) -> tuple[list[str], list[int]]:
+    """Split oversized chunks into pieces for separate requests.
+
+    Returns the pieces along with the index of the chunk each came from, so
+    translated pieces can be joined back with ``join_pieces`` and rendered
+    into the rect of their block.
+    """
+
+    pieces = []
+    owners = []
+    for idx, chunk in enumerate(chunks):
+        for piece in split_text(chunk, max_tokens, model):
+            pieces.append(piece)
+            owners.append(idx)
+    return pieces, owners
+
+
+def join_pieces(pieces: list[str], owners: list[int], count: int) -> list[str]:
+    """Join translated pieces back into ``count`` chunks, see ``split_chunks``."""
+
+    parts: list[list[str]] = [[] for _ in range(count)]
+    for piece, owner in zip(pieces, owners):
+        parts[owner].append(piece)
+    return [" ".join(part) for part in parts]
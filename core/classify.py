@@ -0,0 +1,151 @@
+import re
+import unicodedata
+
+from core.extract import Block
+
+NUMBER = re.compile(r"^[\s\d.,:;()\[\]{}+\-–—/%×±=<>^*#]+$")
+PAGE_NUMBER = re.compile(
+    r"^(page|p\.)?\s*(\d+|[ivx]{1,5})(\s*(/|of)\s*\d+)?$", re.IGNORECASE
+)
+URL = re.compile(
+    r"^(\S+://\S+|www\.\S+|doi:\s*\S+|(https?://)?(dx\.)?doi\.org/\S+"
+    r"|10\.\d{4,9}/\S+|[\w.+-]+@[\w-]+\.[\w.-]+)$",
+    re.IGNORECASE,
+)
+REFERENCE = re.compile(r"^\s*\[\d+\]\s+\S.*\b(1[89]|20)\d{2}[a-z]?\b", re.DOTALL)
+# Kinds of code lines; prose rarely matches more than one kind in a block
+CODE_PATTERNS = [
+    re.compile(pattern)
+    for pattern in (
+        r"[;{}]\s*$",  # statement ends and braces
+        r"\)\s*:\s*$",  # block headers
+        r"^\s*(//|/\*|\*/|#include\b)",  # comments and includes
+        r"=>|:=|[=!]=|\+\+|->",  # operators
+        r"^\s*(def|class)\s+\w+.*:\s*$",
+        r"^\s*(from\s+[\w.]+\s+)?import\s+[\w.]+",
+        r"^\s*[\w.\[\]]+\s*[-+*/]?=\s*\S",  # assignments
+        r"^\s*[\w.]+\(.*\)\s*$",  # calls
+    )
+]
+MATH_CHARS = set("=+−×÷±∓·√∑∏∫∂∇∞≈≠≡≤≥∈⊂⊆∪∩∀∃→⇒⇔^_<>")
+
+# Scripts of target languages that can be told apart from the source text
+LANGUAGE_SCRIPTS = {
+    "persian": {"ARABIC"},
+    "farsi": {"ARABIC"},
+    "arabic": {"ARABIC"},
+    "urdu": {"ARABIC"},
+    "russian": {"CYRILLIC"},
+    "ukrainian": {"CYRILLIC"},
+    "bulgarian": {"CYRILLIC"},
+    "serbian": {"CYRILLIC"},
+    "greek": {"GREEK"},
+    "hebrew": {"HEBREW"},
+    "hindi": {"DEVANAGARI"},
+    "thai": {"THAI"},
+    "chinese": {"CJK"},
+    "japanese": {"CJK", "HIRAGANA", "KATAKANA"},
+    "korean": {"HANGUL"},
+}
+
+
+def letter_script(char: str) -> str:
+    """Unicode script of a letter, e.g. LATIN, ARABIC or CJK."""
+
+    return unicodedata.name(char, "UNKNOWN").split(" ")[0]
+
+
+def language_scripts(lang: str) -> set[str]:
+    """Scripts of ``lang`` other than Latin, from its name or its letters."""
+
+    scripts = set()
+    for word in lang.lower().split():
+        scripts |= LANGUAGE_SCRIPTS.get(word, set())
+    scripts |= {letter_script(char) for char in lang if char.isalpha()}
+    scripts.discard("LATIN")
+    return scripts
+
+
+def is_math(text: str) -> bool:
+    chars = [char for char in text if not char.isspace()]
+    if not chars:
+        return False
+    math = sum(
+        char in MATH_CHARS or unicodedata.category(char) == "Sm" for char in chars
+    )
+    words = re.findall(r"[^\W\d_]{4,}", text)
+    return math / len(chars) > 0.15 and len(words) <= 3
+
+
+def is_code(text: str, monospace: bool = False) -> bool:
+    """Whether most lines of ``text`` look like code.
+
+    Line ends such as ``;`` or ``):`` also close the items of prose lists,
+    so the text must be set in a ``monospace`` font or match more than one
+    kind of code line.
+    """
+
+    lines = [line for line in text.splitlines() if line.strip()]
+    if len(lines) < 2:
+        return False
+    kinds = [
+        {idx for idx, pattern in enumerate(CODE_PATTERNS) if pattern.search(line)}
+        for line in lines
+    ]
+    if sum(bool(line_kinds) for line_kinds in kinds) * 2 < len(lines):
+        return False
+    return monospace or len(set().union(*kinds)) >= 2
+
+
+def skip_reason(
+    text: str, target_lang: str, source_lang: str = "", monospace: bool = False
+) -> str | None:
+    """Why ``text`` needs no translation, or None when it does.
+
+    Catches page numbers and numerals, URLs, DOIs and emails, equations,
+    code listings, reference list entries and text already written in the
+    script of ``target_lang``. The last check is left out when
+    ``source_lang`` shares a script with the target, as between Arabic
+    and Persian.
+    """
+
+    text = text.strip()
+    if NUMBER.match(text) or PAGE_NUMBER.match(text):
+        return "number"
+    if URL.match(text):
+        return "url"
+    if REFERENCE.match(text):
+        return "reference"
+    if is_code(text, monospace):
+        return "code"
+    if is_math(text):
+        return "math"
+
+    scripts = language_scripts(target_lang)
+    if scripts & language_scripts(source_lang):
+        return None
+    letters = [letter_script(char) for char in text if char.isalpha()]
+    if scripts and letters:
+        if sum(script in scripts for script in letters) >= 0.8 * len(letters):
+            return "target_language"
+    return None
+
+
+def filter_blocks(
+    blocks: list[Block], target_lang: str, source_lang: str = ""
+) -> tuple[list[Block], dict[str, int]]:
+    """Split off blocks that need no translation.
+
+    Returns the blocks to translate and the number skipped for each reason.
+    Skipped blocks keep their original text in the output.
+    """
+
+    keep = []
+    skipped: dict[str, int] = {}
+    for block in blocks:
+        reason = skip_reason(block.text, target_lang, source_lang, block.monospace)
+        if reason is None:
+            keep.append(block)
+        else:
+            skipped[reason] = skipped.get(reason, 0) + 1
+    return keep, skipped
@@ -1,23 +1,120 @@
+import asyncio
+import threading
+import time
 from abc import ABC, abstractmethod
-from typing import Optional
+from typing import AsyncIterator, Callable, Iterator, Optional
+
+
+class LatencyStats:
+    """Thread-safe running totals of time-to-first-token and total latency."""
+
+    def __init__(self):
+        self.requests = 0
+        self.first_token_seconds = 0.0
+        self.total_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, first_token: float, total: float) -> None:
+        with self._lock:
+            self.requests += 1
+            self.first_token_seconds += first_token
+            self.total_seconds += total
+
+    def summary(self) -> dict:
+        with self._lock:
+            if not self.requests:
+                return {}
+            return {
+                "requests": self.requests,
+                "mean_ttft": self.first_token_seconds / self.requests,
+                "mean_latency": self.total_seconds / self.requests,
+            }
 
 
 class BaseClient(ABC):
     model: str
     base_url: str
+    timeout: Optional[float] = None
+    max_connections: Optional[int] = None
 
     def __init__(
         self,
         api_key: Optional[str] = None,
         model: Optional[str] = None,
         base_url: Optional[str] = None,
+        timeout: Optional[float] = None,
+        max_connections: Optional[int] = None,
     ):
         self.api_key = api_key
         if model:
             self.model = model
         if base_url:
             self.base_url = base_url
+        if timeout:
+            self.timeout = float(timeout)
+        if max_connections:
+            self.max_connections = int(max_connections)
+        self.latency = LatencyStats()
 
     @abstractmethod
     def ask(self, prompt: str) -> str:
         return NotImplemented("You need to implement the ask method!")
+
+    async def aask(self, prompt: str) -> str:
+        """Ask without blocking the event loop.
+
+        Clients without a native async API run ``ask`` on a worker thread.
+        """
+        return await asyncio.to_thread(self.ask, prompt)
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        """Yield the completion in pieces as they are generated.
+
+        Clients without native streaming yield the whole completion at once.
+        """
+        yield self.ask(prompt)
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        """Async version of ``stream``."""
+        yield await self.aask(prompt)
+
+    def ping(self) -> bool:
+        """Whether the endpoint is reachable, used as a health check."""
+        return True
+
+    async def aping(self) -> bool:
+        """Health check without blocking the event loop."""
+        return await asyncio.to_thread(self.ping)
+
+    def ask_stream(self, prompt: str, on_token: Callable[[str], None]) -> str:
+        """Stream a completion to ``on_token`` and return it in full.
+
+        Time-to-first-token and total latency are recorded in ``latency``.
+        """
+        started = time.perf_counter()
+        first_token = None
+        parts = []
+        for token in self.stream(prompt):
+            if first_token is None:
+                first_token = time.perf_counter() - started
+            parts.append(token)
+            on_token(token)
+
+        total = time.perf_counter() - started
+        self.latency.record(total if first_token is None else first_token, total)
+        return "".join(parts)
+
+    async def aask_stream(self, prompt: str, on_token: Callable[[str], None]) -> str:
+        """Async version of ``ask_stream``."""
+        started = time.perf_counter()
+        first_token = None
+        parts = []
+        async for token in self.astream(prompt):
+            if first_token is None:
+                first_token = time.perf_counter() - started
+            parts.append(token)
+            on_token(token)
+
+        total = time.perf_counter() - started
+        self.latency.record(total if first_token is None else first_token, total)
+        return "".join(parts)
@@ -0,0 +1,66 @@
+from core.client.base import BaseClient
+from core.client.limiter import LimitedClient, endpoint_limiter
+from core.client.router import RouterClient
+
+PROVIDERS = ("ollama", "openai")
+
+
+def endpoint_configs(config: dict) -> list[dict]:
+    """The ``endpoints`` of the config, or its single ``base_url`` and ``model``.
+
+    Settings missing from an endpoint, such as rate limits, are taken from
+    the top level of the config.
+    """
+
+    endpoints = config.get("endpoints") or [{}]
+    return [{**config, **endpoint} for endpoint in endpoints]
+
+
+def create_endpoint_client(endpoint: dict) -> BaseClient:
+    provider = endpoint.get("provider", "ollama")
+    if provider not in PROVIDERS:
+        raise ValueError(f"Unknown provider {provider!r}")
+
+    # Provider SDKs take a second or so to import, so only load the one used
+    kwargs = {}
+    if provider == "ollama":
+        from core.client.ollama import OllamaClient as client_class
+
+        kwargs["keep_alive"] = endpoint.get("keep_alive")
+    else:
+        from core.client.openai import OpenAIClient as client_class
+
+    client = client_class(
+        api_key=endpoint.get("api_key"),
+        model=endpoint["model"],
+        base_url=endpoint["base_url"],
+        timeout=endpoint.get("request_timeout"),
+        max_connections=endpoint.get("max_connections"),
+        **kwargs,
+    )
+    return LimitedClient(client, endpoint_limiter(endpoint["base_url"], endpoint))
+
+
+def create_client(config: dict, tier: str | None = None) -> BaseClient:
+    """Client for the endpoints serving ``tier``, routed when there are several.
+
+    Endpoints list the tiers they serve, ``summarize`` and ``translate``,
+    under ``tiers`` and serve both when it is missing. When no endpoint
+    serves ``tier`` every endpoint is used.
+    """
+
+    endpoints = endpoint_configs(config)
+    if tier is not None:
+        endpoints = [
+            endpoint for endpoint in endpoints if tier in endpoint.get("tiers", [tier])
+        ] or endpoints
+
+    clients = [create_endpoint_client(endpoint) for endpoint in endpoints]
+    if len(clients) == 1:
+        return clients[0]
+    return RouterClient(
+        clients,
+        strategy=config.get("routing", "least_outstanding"),
+        max_failures=int(config.get("endpoint_max_failures", 3)),
+        cooldown=float(config.get("endpoint_cooldown", 30)),
+    )
@@ -0,0 +1,471 @@
+import asyncio
+import collections
+import random
+import sys
+import threading
+import time
+from typing import AsyncIterator, Awaitable, Callable, Iterator, TypeVar
+
+import httpx
+
+from core import metrics
+from core.client.base import BaseClient
+from core.prompt import count_tokens
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Rate limits, transient server errors and connection failures."""
+
+    if getattr(error, "status_code", None) in RETRYABLE_STATUS:
+        return True
+    # OpenAI errors only exist once its client was imported, don't import it here
+    openai = sys.modules.get("openai")
+    if openai is not None and isinstance(error, openai.APIConnectionError):
+        return True
+    return isinstance(error, (httpx.TransportError, ConnectionError, TimeoutError))
+
+
+def retry_after(error: BaseException) -> float | None:
+    """Seconds asked for by a ``Retry-After`` header, if any."""
+
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at ``rate`` tokens per minute."""
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate / 60
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float = 1) -> float:
+        """Take ``amount`` tokens and return how long to wait before using them."""
+
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            # Requests larger than the bucket wait for a full bucket
+            self._tokens -= min(amount, self.capacity)
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+
+class AdaptiveConcurrency:
+    """In-flight request limit adjusted with AIMD.
+
+    Every success adds about one slot per window of ``limit`` requests, as
+    long as latency per prompt token stays within ``latency_tolerance``
+    times the best seen recently. Errors and latency spikes halve the
+    limit, at most once per ``cooldown`` seconds.
+    """
+
+    def __init__(
+        self,
+        initial: float = 4,
+        minimum: float = 1,
+        maximum: float = 64,
+        latency_tolerance: float = 2.0,
+        cooldown: float = 1.0,
+    ):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = min(max(initial, minimum), maximum)
+        self.latency_tolerance = latency_tolerance
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self._baseline: float | None = None
+        self._decreased = 0.0
+        self._cond = threading.Condition()
+        # Futures of async waiters and their loops, woken in order
+        self._waiters: collections.deque = collections.deque()
+
+    def try_acquire(self) -> bool:
+        with self._cond:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return True
+            return False
+
+    def acquire(self) -> None:
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    async def aacquire(self) -> None:
+        loop = asyncio.get_running_loop()
+        with self._cond:
+            if self.in_flight < int(self.limit) and not self._waiters:
+                self.in_flight += 1
+                return
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+
+        try:
+            await waiter[1]
+        except asyncio.CancelledError:
+            with self._cond:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                    raise
+            # The slot was handed over, give it back unless _grant does
+            if not waiter[1].cancelled():
+                self.release()
+            raise
+
+    def _wake(self) -> None:
+        # Hand free slots to async waiters, whose loops may be on any thread
+        while self._waiters and self.in_flight < int(self.limit):
+            loop, future = self._waiters.popleft()
+            self.in_flight += 1
+            try:
+                loop.call_soon_threadsafe(self._grant, future)
+            except RuntimeError:
+                # The waiter's loop is closed
+                self.in_flight -= 1
+
+    def _grant(self, future: asyncio.Future) -> None:
+        if future.done():
+            # Cancelled while its slot was on the way
+            self.release()
+        else:
+            future.set_result(None)
+
+    def release(
+        self, latency: float | None = None, tokens: int = 1, error: bool = False
+    ) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            if error:
+                self._decrease()
+            elif latency is not None:
+                latency /= max(tokens, 1)
+                # Baseline follows the best latency, drifting up slowly
+                if self._baseline is None or latency < self._baseline:
+                    self._baseline = latency
+                else:
+                    self._baseline += 0.01 * (latency - self._baseline)
+
+                if latency > self.latency_tolerance * self._baseline:
+                    self._decrease()
+                else:
+                    self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._wake()
+            self._cond.notify_all()
+
+    def _decrease(self) -> None:
+        now = time.monotonic()
+        if now - self._decreased >= self.cooldown:
+            self.limit = max(self.minimum, self.limit / 2)
+            self._decreased = now
+
+
+# Settings of an endpoint limiter and their defaults
+LIMITER_DEFAULTS = {
+    "rate_limit_rpm": 0,
+    "rate_limit_tpm": 0,
+    "initial_backend_concurrency": 4,
+    "min_backend_concurrency": 1,
+    "max_backend_concurrency": 32,
+    "max_retries": 5,
+    "retry_base_delay": 1.0,
+    "retry_max_delay": 60.0,
+}
+
+
+def limiter_settings(config: dict) -> dict[str, float]:
+    return {
+        name: float(config.get(name, default))
+        for name, default in LIMITER_DEFAULTS.items()
+    }
+
+
+class EndpointLimiter:
+    """Rate limits, adaptive concurrency and retries for one endpoint."""
+
+    def __init__(self, config: dict, endpoint: str = ""):
+        self.endpoint = endpoint
+        settings = limiter_settings(config)
+        rpm = settings["rate_limit_rpm"]
+        tpm = settings["rate_limit_tpm"]
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.concurrency = AdaptiveConcurrency(
+            initial=settings["initial_backend_concurrency"],
+            minimum=settings["min_backend_concurrency"],
+            maximum=settings["max_backend_concurrency"],
+        )
+        self.max_retries = int(settings["max_retries"])
+        self.retry_base_delay = settings["retry_base_delay"]
+        self.retry_max_delay = settings["retry_max_delay"]
+        self.retries = 0
+
+    def _budget_delay(self, tokens: int) -> float:
+        delay = 0.0
+        if self.requests is not None:
+            delay = max(delay, self.requests.reserve(1))
+        if self.tokens is not None:
+            delay = max(delay, self.tokens.reserve(tokens))
+        return delay
+
+    def _retry_delay(self, attempt: int, error: BaseException) -> float:
+        # Full jitter exponential backoff, unless the server says how long
+        delay = retry_after(error)
+        if delay is None:
+            delay = random.uniform(
+                0, min(self.retry_max_delay, self.retry_base_delay * 2**attempt)
+            )
+        return delay
+
+    def _should_retry(self, attempt: int, error: BaseException) -> bool:
+        if attempt >= self.max_retries or not is_retryable(error):
+            return False
+        self.retries += 1
+        metrics.count("llm_retries_total", endpoint=self.endpoint)
+        return True
+
+    def _waited(self, queued: float) -> None:
+        metrics.observe(
+            "llm_queue_wait_seconds", time.monotonic() - queued, endpoint=self.endpoint
+        )
+
+    def call(self, fn: Callable[[], T], tokens: int = 0) -> T:
+        for attempt in range(self.max_retries + 1):
+            queued = time.monotonic()
+            time.sleep(self._budget_delay(tokens))
+            self.concurrency.acquire()
+            self._waited(queued)
+            started = time.monotonic()
+            try:
+                result = fn()
+            except Exception as e:
+                self.concurrency.release(error=is_retryable(e))
+                if not self._should_retry(attempt, e):
+                    raise
+                time.sleep(self._retry_delay(attempt, e))
+                continue
+            except BaseException:
+                self.concurrency.release()
+                raise
+            self.concurrency.release(time.monotonic() - started, tokens)
+            return result
+
+    async def acall(self, fn: Callable[[], Awaitable[T]], tokens: int = 0) -> T:
+        for attempt in range(self.max_retries + 1):
+            queued = time.monotonic()
+            await asyncio.sleep(self._budget_delay(tokens))
+            await self.concurrency.aacquire()
+            self._waited(queued)
+            started = time.monotonic()
+            try:
+                result = await fn()
+            except Exception as e:
+                self.concurrency.release(error=is_retryable(e))
+                if not self._should_retry(attempt, e):
+                    raise
+                await asyncio.sleep(self._retry_delay(attempt, e))
+                continue
+            except BaseException:
+                # Cancelled while waiting on the backend
+                self.concurrency.release()
+                raise
+            self.concurrency.release(time.monotonic() - started, tokens)
+            return result
+
+    def stream(self, fn: Callable[[], Iterator[str]], tokens: int = 0) -> Iterator[str]:
+        """Like ``call`` for a token stream; only retried before the first token."""
+
+        for attempt in range(self.max_retries + 1):
+            queued = time.monotonic()
+            time.sleep(self._budget_delay(tokens))
+            self.concurrency.acquire()
+            self._waited(queued)
+            started = time.monotonic()
+            streamed = False
+            try:
+                for token in fn():
+                    streamed = True
+                    yield token
+            except Exception as e:
+                self.concurrency.release(error=is_retryable(e))
+                if streamed or not self._should_retry(attempt, e):
+                    raise
+                time.sleep(self._retry_delay(attempt, e))
+                continue
+            except BaseException:
+                self.concurrency.release()
+                raise
+            self.concurrency.release(time.monotonic() - started, tokens)
+            return
+
+    async def astream(
+        self, fn: Callable[[], AsyncIterator[str]], tokens: int = 0
+    ) -> AsyncIterator[str]:
+        """Async version of ``stream``."""
+
+        for attempt in range(self.max_retries + 1):
+            queued = time.monotonic()
+            await asyncio.sleep(self._budget_delay(tokens))
+            await self.concurrency.aacquire()
+            self._waited(queued)
+            started = time.monotonic()
+            streamed = False
+            try:
+                async for token in fn():
+                    streamed = True
+                    yield token
+            except Exception as e:
+                self.concurrency.release(error=is_retryable(e))
+                if streamed or not self._should_retry(attempt, e):
+                    raise
+                await asyncio.sleep(self._retry_delay(attempt, e))
+                continue
+            except BaseException:
+                self.concurrency.release()
+                raise
+            self.concurrency.release(time.monotonic() - started, tokens)
+            return
+
+
+_limiters: dict[tuple, EndpointLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def endpoint_limiter(base_url: str, config: dict) -> EndpointLimiter:
+    """The limiter shared by every client of ``base_url`` with the same settings.
+
+    Endpoints on one ``base_url`` with their own API key or rate limits,
+    such as several accounts of a provider, get limiters of their own.
+    """
+
+    settings = limiter_settings(config)
+    key = (base_url, config.get("api_key"), *settings.values())
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = EndpointLimiter(config, endpoint=base_url)
+            _limiters[key] = limiter
+        return limiter
+
+
+class LimitedClient(BaseClient):
+    """Send the requests of ``client`` through an endpoint limiter.
+
+    Latency, time to first token, tokens and outcome of every request are
+    recorded in the metrics, and as spans of the current job trace.
+    """
+
+    def __init__(self, client: BaseClient, limiter: EndpointLimiter):
+        super().__init__(model=client.model, base_url=client.base_url)
+        self.client = client
+        self.limiter = limiter
+
+    def _record(
+        self,
+        started: float,
+        prompt_tokens: int,
+        response: str | None,
+        first_token: float | None = None,
+    ) -> None:
+        seconds = time.perf_counter() - started
+        labels = {"model": self.model, "endpoint": self.base_url}
+        outcome = "error" if response is None else "ok"
+        metrics.count("llm_requests_total", outcome=outcome, **labels)
+        metrics.observe("llm_request_seconds", seconds, **labels)
+        metrics.count("llm_prompt_tokens_total", prompt_tokens, **labels)
+        attrs = {"model": self.model, "prompt_tokens": prompt_tokens}
+        if response is not None:
+            completion_tokens = count_tokens(response, self.model)
+            metrics.count("llm_completion_tokens_total", completion_tokens, **labels)
+            attrs["completion_tokens"] = completion_tokens
+        if first_token is not None:
+            metrics.observe("llm_ttft_seconds", first_token, **labels)
+            attrs["ttft"] = round(first_token, 6)
+
+        trace = metrics.current_trace()
+        if trace is not None:
+            trace.add_span("llm_request", started, seconds, outcome=outcome, **attrs)
+
+    def ask(self, prompt: str) -> str:
+        tokens = count_tokens(prompt, self.model)
+        started = time.perf_counter()
+        response = None
+        try:
+            response = self.limiter.call(lambda: self.client.ask(prompt), tokens=tokens)
+            return response
+        finally:
+            self._record(started, tokens, response)
+
+    async def aask(self, prompt: str) -> str:
+        tokens = count_tokens(prompt, self.model)
+        started = time.perf_counter()
+        response = None
+        try:
+            response = await self.limiter.acall(
+                lambda: self.client.aask(prompt), tokens=tokens
+            )
+            return response
+        finally:
+            self._record(started, tokens, response)
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        tokens = count_tokens(prompt, self.model)
+        started = time.perf_counter()
+        first_token = None
+        parts: list[str] | None = []
+        try:
+            for token in self.limiter.stream(
+                lambda: self.client.stream(prompt), tokens=tokens
+            ):
+                if first_token is None:
+                    first_token = time.perf_counter() - started
+                parts.append(token)
+                yield token
+        except BaseException:
+            parts = None
+            raise
+        finally:
+            response = None if parts is None else "".join(parts)
+            self._record(started, tokens, response, first_token)
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        tokens = count_tokens(prompt, self.model)
+        started = time.perf_counter()
+        first_token = None
+        parts: list[str] | None = []
+        try:
+            async for token in self.limiter.astream(
+                lambda: self.client.astream(prompt), tokens=tokens
+            ):
+                if first_token is None:
+                    first_token = time.perf_counter() - started
+                parts.append(token)
+                yield token
+        except BaseException:
+            parts = None
+            raise
+        finally:
+            response = None if parts is None else "".join(parts)
+            self._record(started, tokens, response, first_token)
+
+    def ping(self) -> bool:
+        return self.client.ping()
+
+    async def aping(self) -> bool:
+        return await self.client.aping()
@@ -1,13 +1,99 @@
+import asyncio
+import threading
+import weakref
+from typing import AsyncIterator, Iterator
+
+import httpx
 from langchain_ollama import ChatOllama
 
 from core.client.base import BaseClient
 
+# One long-lived chat model, and thus one keep-alive connection pool,
+# per endpoint and settings shared by every client and thread
+_llms: dict[tuple, ChatOllama] = {}
+# Async connection pools are bound to their event loop, so keep one per loop
+_async_llms: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+_llms_lock = threading.Lock()
+
 
 class OllamaClient(BaseClient):
-    def ask(self, prompt: str) -> str:
-        llm = ChatOllama(
+    def __init__(self, *args, keep_alive: str | int | None = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # How long the server keeps the model, and its prompt cache, loaded
+        self.keep_alive = keep_alive
+
+    def _create_llm(self) -> ChatOllama:
+        client_kwargs = {"timeout": self.timeout}
+        if self.max_connections:
+            client_kwargs["limits"] = httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections,
+            )
+        return ChatOllama(
             model=self.model,
             base_url=self.base_url,
+            keep_alive=self.keep_alive,
+            client_kwargs=client_kwargs,
         )
-        resp = llm.invoke(prompt)
+
+    def _key(self) -> tuple:
+        return (
+            self.base_url,
+            self.model,
+            self.timeout,
+            self.max_connections,
+            self.keep_alive,
+        )
+
+    def _llm(self) -> ChatOllama:
+        key = self._key()
+        with _llms_lock:
+            llm = _llms.get(key)
+            if llm is None:
+                llm = self._create_llm()
+                _llms[key] = llm
+        return llm
+
+    def _async_llm(self) -> ChatOllama:
+        key = self._key()
+        loop = asyncio.get_running_loop()
+        with _llms_lock:
+            llms = _async_llms.setdefault(loop, {})
+            llm = llms.get(key)
+            if llm is None:
+                llm = self._create_llm()
+                llms[key] = llm
+        return llm
+
+    def ask(self, prompt: str) -> str:
+        resp = self._llm().invoke(prompt)
+        return resp.content
+
+    async def aask(self, prompt: str) -> str:
+        resp = await self._async_llm().ainvoke(prompt)
         return resp.content
+
+    def ping(self) -> bool:
+        try:
+            response = httpx.get(f"{self.base_url.rstrip('/')}/api/tags", timeout=5)
+        except httpx.HTTPError:
+            return False
+        return response.is_success
+
+    async def aping(self) -> bool:
+        try:
+            async with httpx.AsyncClient(timeout=5) as client:
+                response = await client.get(f"{self.base_url.rstrip('/')}/api/tags")
+        except httpx.HTTPError:
+            return False
+        return response.is_success
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        for chunk in self._llm().stream(prompt):
+            if chunk.content:
+                yield chunk.content
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        async for chunk in self._async_llm().astream(prompt):
+            if chunk.content:
+                yield chunk.content
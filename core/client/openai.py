@@ -1,24 +1,134 @@
+import asyncio
 import os
+import threading
+import weakref
+from typing import AsyncIterator, Iterator
 
-from openai import OpenAI
+import httpx
+from openai import (
+    AsyncOpenAI,
+    DefaultAsyncHttpxClient,
+    DefaultHttpxClient,
+    OpenAI,
+    OpenAIError,
+)
 
 from core.client.base import BaseClient
 
+# One long-lived client, and thus one keep-alive connection pool,
+# per endpoint and settings shared by every client and thread
+_clients: dict[tuple, OpenAI] = {}
+# Async connection pools are bound to their event loop, so keep one per loop
+_async_clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+_clients_lock = threading.Lock()
+
 
 class OpenAIClient(BaseClient):
-    def ask(self, prompt: str) -> str:
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
         # Find the API key based on the base URL
-        if "openrouter" in self.base_url:
-            self.api_key = os.getenv("OPENROUTER_API_KEY")
-        elif "openai" in self.base_url:
-            self.api_key = os.getenv("OPENAI_API_KEY")
-
-        client = OpenAI(
-            base_url=self.base_url,
-            api_key=self.api_key,
+        if self.api_key is None:
+            if "openrouter" in self.base_url:
+                self.api_key = os.getenv("OPENROUTER_API_KEY")
+            elif "openai" in self.base_url:
+                self.api_key = os.getenv("OPENAI_API_KEY")
+
+    def _http_kwargs(self) -> dict:
+        http_kwargs = {}
+        if self.timeout:
+            http_kwargs["timeout"] = self.timeout
+        if self.max_connections:
+            http_kwargs["limits"] = httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections,
+            )
+        return http_kwargs
+
+    def _key(self) -> tuple:
+        return (
+            self.base_url,
+            self.model,
+            self.api_key,
+            self.timeout,
+            self.max_connections,
+        )
+
+    def _client(self) -> OpenAI:
+        key = self._key()
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = OpenAI(
+                    base_url=self.base_url,
+                    api_key=self.api_key,
+                    # Retries are left to the endpoint limiter
+                    max_retries=0,
+                    http_client=DefaultHttpxClient(**self._http_kwargs()),
+                )
+                _clients[key] = client
+        return client
+
+    def _async_client(self) -> AsyncOpenAI:
+        key = self._key()
+        loop = asyncio.get_running_loop()
+        with _clients_lock:
+            clients = _async_clients.setdefault(loop, {})
+            client = clients.get(key)
+            if client is None:
+                client = AsyncOpenAI(
+                    base_url=self.base_url,
+                    api_key=self.api_key,
+                    max_retries=0,
+                    http_client=DefaultAsyncHttpxClient(**self._http_kwargs()),
+                )
+                clients[key] = client
+        return client
+
+    def ask(self, prompt: str) -> str:
+        completion = self._client().chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": [{"type": "text", "text": prompt}]}],
         )
-        completion = client.chat.completions.create(
+        return completion.choices[0].message.content
+
+    async def aask(self, prompt: str) -> str:
+        completion = await self._async_client().chat.completions.create(
             model=self.model,
             messages=[{"role": "user", "content": [{"type": "text", "text": prompt}]}],
         )
         return completion.choices[0].message.content
+
+    def ping(self) -> bool:
+        try:
+            self._client().models.list(timeout=5)
+        except OpenAIError:
+            return False
+        return True
+
+    async def aping(self) -> bool:
+        try:
+            await self._async_client().models.list(timeout=5)
+        except OpenAIError:
+            return False
+        return True
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        chunks = self._client().chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": [{"type": "text", "text": prompt}]}],
+            stream=True,
+        )
+        for chunk in chunks:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        chunks = await self._async_client().chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": [{"type": "text", "text": prompt}]}],
+            stream=True,
+        )
+        async for chunk in chunks:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
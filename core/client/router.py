@@ -0,0 +1,303 @@
+import threading
+import time
+from typing import AsyncIterator, Awaitable, Callable, Iterator, TypeVar
+
+from core.client.base import BaseClient
+from core.client.limiter import is_retryable
+
+T = TypeVar("T")
+
+# Load and health of each (base_url, model) are shared by every router so
+# jobs running at the same time see each other's requests and failures
+_endpoints: dict[tuple[str, str], "Endpoint"] = {}
+_endpoints_lock = threading.Lock()
+
+
+class Endpoint:
+    """Load and health of one backend behind a ``RouterClient``."""
+
+    def __init__(self):
+        self.outstanding = 0
+        # Moving average of request latency, None until the first success
+        self.latency: float | None = None
+        self.failures = 0
+        self.down_until = 0.0
+        self.probing = False
+
+
+def shared_endpoint(client: BaseClient) -> Endpoint:
+    with _endpoints_lock:
+        key = (client.base_url, client.model)
+        endpoint = _endpoints.get(key)
+        if endpoint is None:
+            endpoint = Endpoint()
+            _endpoints[key] = endpoint
+        return endpoint
+
+
+class RouterClient(BaseClient):
+    """Spread requests over several clients and fail over between them.
+
+    Each request goes to the healthy endpoint with the fewest requests in
+    flight, or with ``strategy="latency"`` the lowest expected wait, that
+    is requests in flight times average latency. An endpoint failing
+    ``max_failures`` requests in a row is taken out of rotation for
+    ``cooldown`` seconds, then the next request probes it with ``ping``
+    before sending it traffic again. Requests failing with a retryable
+    error, after any retries of the endpoint itself, are sent to the other
+    endpoints.
+    """
+
+    def __init__(
+        self,
+        clients: list[BaseClient],
+        strategy: str = "least_outstanding",
+        max_failures: int = 3,
+        cooldown: float = 30.0,
+    ):
+        models = sorted({client.model for client in clients})
+        super().__init__(
+            model=",".join(models),
+            base_url=",".join(client.base_url for client in clients),
+        )
+        # Routers keep their own clients, so endpoints sharing a base_url
+        # and model still use their own settings, only health is shared
+        self.clients = clients
+        self.endpoints = [shared_endpoint(client) for client in clients]
+        self.strategy = strategy
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self.failovers = 0
+
+    def _score(self, endpoint: Endpoint) -> float:
+        if self.strategy == "latency":
+            # Untried endpoints go first so every endpoint gets measured
+            return (endpoint.outstanding + 1) * (endpoint.latency or 0.0)
+        return endpoint.outstanding
+
+    def _probed(self, endpoint: Endpoint, healthy: bool) -> bool:
+        with _endpoints_lock:
+            endpoint.probing = False
+            if healthy:
+                endpoint.failures = 0
+                endpoint.down_until = 0.0
+            else:
+                endpoint.down_until = time.monotonic() + self.cooldown
+        return healthy
+
+    def _probe(self, i: int) -> bool:
+        try:
+            healthy = self.clients[i].ping()
+        except Exception:
+            healthy = False
+        return self._probed(self.endpoints[i], healthy)
+
+    async def _aprobe(self, i: int) -> bool:
+        try:
+            healthy = await self.clients[i].aping()
+        except Exception:
+            healthy = False
+        return self._probed(self.endpoints[i], healthy)
+
+    def _pick(self, tried: set[int]) -> tuple[int, bool] | None:
+        """Index of an endpoint not yet tried, and whether to probe it first.
+
+        Endpoints not needing a probe are counted in flight right away.
+        """
+
+        now = time.monotonic()
+        with _endpoints_lock:
+            candidates = [
+                (i, endpoint)
+                for i, endpoint in enumerate(self.endpoints)
+                if i not in tried and endpoint.down_until <= now
+            ]
+            for i, endpoint in candidates:
+                # Endpoints back from a cooldown are probed by one request
+                if endpoint.failures >= self.max_failures and not endpoint.probing:
+                    endpoint.probing = True
+                    return i, True
+
+            healthy = [
+                (i, endpoint)
+                for i, endpoint in candidates
+                if endpoint.failures < self.max_failures
+            ]
+            if not healthy:
+                # Everything is down, try the endpoint that recovers first
+                remaining = [
+                    (i, endpoint)
+                    for i, endpoint in enumerate(self.endpoints)
+                    if i not in tried
+                ]
+                if not remaining:
+                    return None
+                healthy = [min(remaining, key=lambda e: e[1].down_until)]
+            i, endpoint = min(healthy, key=lambda e: self._score(e[1]))
+            tried.add(i)
+            endpoint.outstanding += 1
+            return i, False
+
+    def _admit(self, i: int, tried: set[int]) -> int:
+        with _endpoints_lock:
+            tried.add(i)
+            self.endpoints[i].outstanding += 1
+        return i
+
+    def _acquire(self, tried: set[int]) -> int | None:
+        """Pick an endpoint not yet tried for this request and count it in flight."""
+
+        while (picked := self._pick(tried)) is not None:
+            i, probe = picked
+            if not probe:
+                return i
+            if self._probe(i):
+                return self._admit(i, tried)
+            tried.add(i)
+        return None
+
+    async def _aacquire(self, tried: set[int]) -> int | None:
+        """Like ``_acquire``, probing without blocking the event loop."""
+
+        while (picked := self._pick(tried)) is not None:
+            i, probe = picked
+            if not probe:
+                return i
+            if await self._aprobe(i):
+                return self._admit(i, tried)
+            tried.add(i)
+        return None
+
+    def _exhausted(self, error: Exception | None) -> Exception:
+        # Every endpoint failed its health check before any request was sent
+        if error is None:
+            return ConnectionError(f"No healthy endpoint among {self.base_url}")
+        return error
+
+    def _release(self, endpoint: Endpoint, started: float, error: bool = False) -> None:
+        with _endpoints_lock:
+            endpoint.outstanding -= 1
+            if error:
+                endpoint.failures += 1
+                if endpoint.failures >= self.max_failures:
+                    endpoint.down_until = time.monotonic() + self.cooldown
+                return
+            endpoint.failures = 0
+            latency = time.monotonic() - started
+            if endpoint.latency is None:
+                endpoint.latency = latency
+            else:
+                endpoint.latency += 0.2 * (latency - endpoint.latency)
+
+    def _call(self, fn: Callable[[BaseClient], T]) -> T:
+        tried: set[int] = set()
+        error: Exception | None = None
+        while (i := self._acquire(tried)) is not None:
+            endpoint = self.endpoints[i]
+            started = time.monotonic()
+            try:
+                result = fn(self.clients[i])
+            except Exception as e:
+                self._release(endpoint, started, error=is_retryable(e))
+                if not is_retryable(e):
+                    raise
+                error = e
+                self.failovers += 1
+                continue
+            except BaseException:
+                self._release(endpoint, started)
+                raise
+            self._release(endpoint, started)
+            return result
+        raise self._exhausted(error)
+
+    async def _acall(self, fn: Callable[[BaseClient], Awaitable[T]]) -> T:
+        tried: set[int] = set()
+        error: Exception | None = None
+        while (i := await self._aacquire(tried)) is not None:
+            endpoint = self.endpoints[i]
+            started = time.monotonic()
+            try:
+                result = await fn(self.clients[i])
+            except Exception as e:
+                self._release(endpoint, started, error=is_retryable(e))
+                if not is_retryable(e):
+                    raise
+                error = e
+                self.failovers += 1
+                continue
+            except BaseException:
+                self._release(endpoint, started)
+                raise
+            self._release(endpoint, started)
+            return result
+        raise self._exhausted(error)
+
+    def ask(self, prompt: str) -> str:
+        return self._call(lambda client: client.ask(prompt))
+
+    async def aask(self, prompt: str) -> str:
+        return await self._acall(lambda client: client.aask(prompt))
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        """Stream from one endpoint, failing over only before the first token."""
+
+        tried: set[int] = set()
+        error: Exception | None = None
+        while (i := self._acquire(tried)) is not None:
+            endpoint = self.endpoints[i]
+            started = time.monotonic()
+            streamed = False
+            try:
+                for token in self.clients[i].stream(prompt):
+                    streamed = True
+                    yield token
+            except Exception as e:
+                self._release(endpoint, started, error=is_retryable(e))
+                if streamed or not is_retryable(e):
+                    raise
+                error = e
+                self.failovers += 1
+                continue
+            except BaseException:
+                self._release(endpoint, started)
+                raise
+            self._release(endpoint, started)
+            return
+        raise self._exhausted(error)
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        """Async version of ``stream``."""
+
+        tried: set[int] = set()
+        error: Exception | None = None
+        while (i := await self._aacquire(tried)) is not None:
+            endpoint = self.endpoints[i]
+            started = time.monotonic()
+            streamed = False
+            try:
+                async for token in self.clients[i].astream(prompt):
+                    streamed = True
+                    yield token
+            except Exception as e:
+                self._release(endpoint, started, error=is_retryable(e))
+                if streamed or not is_retryable(e):
+                    raise
+                error = e
+                self.failovers += 1
+                continue
+            except BaseException:
+                self._release(endpoint, started)
+                raise
+            self._release(endpoint, started)
+            return
+        raise self._exhausted(error)
+
+    def ping(self) -> bool:
+        return any(self._probe(i) for i in range(len(self.endpoints)))
+
+    async def aping(self) -> bool:
+        for i in range(len(self.endpoints)):
+            if await self._aprobe(i):
+                return True
+        return False
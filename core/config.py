@@ -0,0 +1,26 @@
+import os
+from pathlib import Path
+
+import yaml
+from dotenv import load_dotenv
+
+CONFIG_FILE = Path("config.yaml")
+ENV_FILE = Path(".env")
+
+
+def load_config(config_file: Path = CONFIG_FILE, env_file: Path = ENV_FILE) -> dict:
+    # Load environment variables from .env into os.environ
+    if env_file.exists():
+        load_dotenv(env_file)
+
+    # Start with config from YAML
+    config = {}
+    if config_file.exists():
+        with open(config_file, "r") as f:
+            config = yaml.safe_load(f) or {}
+
+    # Merge in all environment variables
+    for key, value in os.environ.items():
+        config[key.lower()] = value
+
+    return config
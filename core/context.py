@@ -0,0 +1,50 @@
+from core.chunk import split_text
+from core.extract import Block
+
+# How much of the document summary goes into each translation prompt:
+# full sends it whole, capped its first context_tokens tokens, and section
+# a summary of the section_pages pages around the block, also capped
+STRATEGIES = ("full", "capped", "section")
+
+
+def context_settings(config: dict) -> tuple[str, int, int]:
+    """The context strategy, token cap and section size set in the config."""
+
+    strategy = config.get("context_strategy", "capped")
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown context_strategy {strategy!r}")
+
+    max_tokens = 0 if strategy == "full" else int(config.get("context_tokens", 256))
+    section_pages = 0
+    if strategy == "section":
+        section_pages = max(1, int(config.get("section_pages", 10)))
+    return strategy, max_tokens, section_pages
+
+
+def cap_summary(summary: str, max_tokens: int, model: str | None = None) -> str:
+    """The leading sentences of ``summary`` fitting in ``max_tokens`` tokens."""
+
+    if not max_tokens:
+        return summary
+    return split_text(summary, max_tokens, model)[0]
+
+
+def section_of(page: int, section_pages: int) -> int:
+    """Section of a 0-indexed page, the whole document is section 0 if unset."""
+
+    return page // section_pages if section_pages else 0
+
+
+def group_sections(blocks: list[Block], section_pages: int) -> dict[int, list[Block]]:
+    sections: dict[int, list[Block]] = {}
+    for block in blocks:
+        sections.setdefault(section_of(block.page, section_pages), []).append(block)
+    return sections
+
+
+def block_contexts(
+    blocks: list[Block], contexts: dict[int, str], section_pages: int
+) -> list[str]:
+    """The context of every block, from the contexts of its section."""
+
+    return [contexts.get(section_of(block.page, section_pages), "") for block in blocks]
@@ -1,8 +1,48 @@
-from typing import IO
+import os
+import threading
+from dataclasses import dataclass
+from functools import partial
+from typing import IO, Sequence
 
 import pymupdf
-import pymupdf4llm
-from langchain.text_splitter import MarkdownTextSplitter
+
+from core import metrics
+from core.cache import content_hash, normalize_text
+from core.prompt import count_tokens
+from core.shard import run_shards, shard_pages
+
+# PyMuPDF is not thread-safe, so jobs running on several threads take turns
+PDF_LOCK = threading.RLock()
+
+
+@dataclass(slots=True)
+class Block:
+    """A text block of a PDF page, as laid out in the source document."""
+
+    page: int  # 0-indexed page number in the source document
+    rect: tuple[float, float, float, float]
+    text: str
+    font_size: float
+    hash: str
+    monospace: bool = False  # set in a monospaced font, as code usually is
+
+
+def file_path(pdf_file: IO[bytes] | pymupdf.Document) -> str | None:
+    """Path of ``pdf_file`` or of an opened document on disk, None if in memory."""
+
+    name = getattr(pdf_file, "name", None)
+    if isinstance(name, str) and os.path.isfile(name):
+        return name
+    return None
+
+
+def open_document(pdf_file: IO[bytes]) -> pymupdf.Document:
+    """Open ``pdf_file`` from disk when possible so pages load lazily."""
+
+    path = file_path(pdf_file)
+    if path is not None:
+        return pymupdf.open(path)
+    return pymupdf.open(stream=pdf_file.read(), filetype="pdf")
 
 
 def get_page_count(pdf_file: IO[bytes]) -> int:
@@ -23,10 +63,146 @@ def extract_layout(pdf_file: IO[bytes]):
     doc.save("output.pdf")
 
 
-def extract_text(pdf_file: IO[bytes], chunk_size: int) -> list[pymupdf.Document]:
-    md_text = pymupdf4llm.to_markdown(pdf_file)
+def markdown_shard(path: str, pages: Sequence[int], hdr_info) -> str:
+    """Markdown of ``pages`` of the PDF at ``path``, run in a worker process."""
+
+    import pymupdf4llm
+
+    return pymupdf4llm.to_markdown(path, pages=list(pages), hdr_info=hdr_info)
+
+
+def to_markdown(
+    pdf_file: IO[bytes], pages: list[int] | None = None, workers: int = 1
+) -> str:
+    """Markdown of ``pages`` (0-indexed, all if None) of ``pdf_file``.
+
+    With several ``workers`` and the file on disk, page ranges are
+    converted in worker processes and joined in order.
+    """
+
+    import pymupdf4llm
+    from pymupdf4llm.helpers.pymupdf_rag import IdentifyHeaders
+
+    path = file_path(pdf_file)
+    if path is not None and workers > 1:
+        with pymupdf.open(path) as doc:
+            if pages is None:
+                pages = list(range(doc.page_count))
+            shards = shard_pages(pages, workers)
+            if len(shards) > 1:
+                # Header levels come from font sizes over the whole document,
+                # scan it once so every range agrees on them
+                hdr_info = IdentifyHeaders(doc)
+                return "".join(
+                    run_shards(
+                        markdown_shard,
+                        [(path, shard, hdr_info) for shard in shards],
+                        workers,
+                    )
+                )
+    return pymupdf4llm.to_markdown(pdf_file, pages=pages)
+
+
+def extract_text(
+    pdf_file: IO[bytes],
+    chunk_tokens: int,
+    pages: list[int] | None = None,
+    model: str | None = None,
+    workers: int = 1,
+) -> list[pymupdf.Document]:
+    """Split the markdown of ``pages`` (0-indexed, all if None) into chunks.
 
-    splitter = MarkdownTextSplitter(chunk_size=chunk_size, chunk_overlap=0)
+    Chunks hold up to ``chunk_tokens`` tokens as counted for ``model``.
+    The markdown is built by up to ``workers`` processes.
+    """
+
+    # Imported lazily, it is slow to load and only needed here
+    from langchain.text_splitter import MarkdownTextSplitter
+
+    with metrics.span("extract_markdown"):
+        md_text = to_markdown(pdf_file, pages, workers)
+
+    splitter = MarkdownTextSplitter(
+        chunk_size=chunk_tokens,
+        chunk_overlap=0,
+        length_function=partial(count_tokens, model=model),
+    )
     docs = splitter.create_documents([md_text])
 
     return docs
+
+
+def is_monospace(span: dict) -> bool:
+    font = span["font"].lower()
+    return bool(span["flags"] & pymupdf.TEXT_FONT_MONOSPACED) or any(
+        name in font for name in ("mono", "courier", "consol")
+    )
+
+
+def extract_page_blocks(page: pymupdf.Page) -> list[Block]:
+    """Extract the non-empty text blocks of ``page`` in reading order."""
+
+    blocks = []
+    for block in page.get_text("dict", flags=pymupdf.TEXTFLAGS_TEXT)["blocks"]:
+        lines = []
+        sizes = []
+        monospace = []
+        for line in block.get("lines", []):
+            lines.append("".join(span["text"] for span in line["spans"]))
+            for span in line["spans"]:
+                if span["text"].strip():
+                    sizes.append(span["size"])
+                    monospace.append(is_monospace(span))
+
+        text = "\n".join(lines)
+        if not text.strip():
+            continue
+
+        blocks.append(
+            Block(
+                page=page.number,
+                rect=tuple(block["bbox"]),
+                text=text,
+                font_size=max(sizes, default=0.0),
+                hash=content_hash(normalize_text(text)),
+                monospace=bool(monospace) and all(monospace),
+            )
+        )
+    return blocks
+
+
+def extract_shard(path: str, pages: Sequence[int]) -> list[Block]:
+    """Blocks of ``pages`` of the PDF at ``path``, run in a worker process."""
+
+    with pymupdf.open(path) as doc:
+        return [block for pno in pages for block in extract_page_blocks(doc[pno])]
+
+
+def build_block_index(
+    doc: pymupdf.Document, pages: Sequence[int] | None = None, workers: int = 1
+) -> list[Block]:
+    """Extract the text blocks of ``pages`` (0-indexed, all if None) in one pass.
+
+    With several ``workers`` and ``doc`` opened from disk, page ranges are
+    extracted in worker processes, which send back only their blocks.
+    """
+
+    if pages is None:
+        pages = range(doc.page_count)
+
+    path = file_path(doc)
+    shards = shard_pages(pages, workers) if path is not None else [pages]
+
+    index = []
+    with metrics.span("extract_blocks") as attrs:
+        if len(shards) > 1:
+            for blocks in run_shards(
+                extract_shard, [(path, shard) for shard in shards], workers
+            ):
+                index.extend(blocks)
+            attrs["shards"] = len(shards)
+        else:
+            for pno in pages:
+                index.extend(extract_page_blocks(doc[pno]))
+        attrs["blocks"] = len(index)
+    return index
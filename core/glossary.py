@@ -0,0 +1,152 @@
+import csv
+import re
+from collections import Counter, deque
+from pathlib import Path
+
+import yaml
+
+GLOSSARY_LINE = re.compile(r"^\s*(.+?)\s*=>\s*(.+?)\s*$")
+ACRONYM = re.compile(r"\b[A-Z][A-Z0-9-]*[A-Z0-9]s?\b")
+PROPER_PHRASE = re.compile(r"\b[A-Z][a-z]+(?:[ -][A-Z][a-z]+)+\b")
+CLAUSE_BREAK = re.compile(r"[.,;:!?()\[\]\"]")
+WORD = re.compile(r"[^\W\d_][\w-]*[^\W_]")
+STOPWORDS = frozenset(
+    """a an and are as at be been being but by can could did do does for from
+    had has have how if in into is it its may more most not of on or our over
+    such than that the their them then there these they this those through to
+    under was we were what when where which while who will with would you your
+    also each both between other only same some using used use very""".split()
+)
+
+
+def normalize_term(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class TermIndex:
+    """Aho-Corasick automaton over the terms of a glossary.
+
+    ``find`` returns the entries of every term occurring in a text, matched
+    case-insensitively on word boundaries, in one pass over the text.
+    """
+
+    def __init__(self, glossary: dict[str, str]):
+        self.glossary = glossary
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail = [0]
+        # Terms ending at each node, with their length
+        self._out: list[list[tuple[str, int]]] = [[]]
+
+        for term in glossary:
+            key = normalize_term(term).lower()
+            node = 0
+            for char in key:
+                nxt = self._goto[node].get(char)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][char] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = nxt
+            self._out[node].append((term, len(key)))
+
+        # Breadth-first so the failure link of a node is set before its children
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, nxt in self._goto[node].items():
+                queue.append(nxt)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                if node:
+                    self._fail[nxt] = self._goto[fail].get(char, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def __len__(self) -> int:
+        return len(self.glossary)
+
+    def find(self, text: str) -> dict[str, str]:
+        text = normalize_term(text).lower()
+        found = {}
+        node = 0
+        for end, char in enumerate(text):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for term, length in self._out[node]:
+                start = end - length + 1
+                before = text[start - 1] if start > 0 else " "
+                after = text[end + 1] if end + 1 < len(text) else " "
+                if not before.isalnum() and not after.isalnum():
+                    found[term] = self.glossary[term]
+        return found
+
+
+def load_glossary(path: str | Path) -> dict[str, str]:
+    """Read a glossary of term translations.
+
+    YAML files hold a mapping of terms to translations; other files are read
+    as CSV or TSV with the term in the first column and its translation in
+    the second.
+    """
+
+    path = Path(path)
+    if path.suffix.lower() in (".yaml", ".yml"):
+        with open(path, encoding="utf-8") as f:
+            entries = yaml.safe_load(f) or {}
+        return {str(term): str(text) for term, text in entries.items()}
+
+    with open(path, encoding="utf-8", newline="") as f:
+        delimiter = "\t" if path.suffix.lower() == ".tsv" else ","
+        return {
+            row[0].strip(): row[1].strip()
+            for row in csv.reader(f, delimiter=delimiter)
+            if len(row) >= 2 and row[0].strip() and not row[0].startswith("#")
+        }
+
+
+def extract_terms(
+    texts: list[str], max_terms: int = 200, min_count: int = 3
+) -> list[str]:
+    """Candidate terms of a document, most frequent first.
+
+    Acronyms, capitalized phrases such as names of methods, and word pairs
+    without stopwords that occur at least ``min_count`` times.
+    """
+
+    counts: Counter[str] = Counter()
+    for text in texts:
+        text = normalize_term(text)
+        counts.update(ACRONYM.findall(text))
+        counts.update(PROPER_PHRASE.findall(text))
+
+        for clause in CLAUSE_BREAK.split(text):
+            words = [word.lower() for word in WORD.findall(clause)]
+            for first, second in zip(words, words[1:]):
+                if (
+                    first not in STOPWORDS
+                    and second not in STOPWORDS
+                    and len(first) > 2
+                    and len(second) > 2
+                ):
+                    counts[f"{first} {second}"] += 1
+
+    return [term for term, count in counts.most_common(max_terms) if count >= min_count]
+
+
+def parse_glossary(resp: str, terms: list[str]) -> dict[str, str]:
+    """Entries of a ``term => translation`` response for the requested terms."""
+
+    wanted = {term.lower(): term for term in terms}
+    glossary = {}
+    for line in resp.splitlines():
+        match = GLOSSARY_LINE.match(line.strip("-* "))
+        if match and match.group(1).lower() in wanted:
+            glossary[wanted[match.group(1).lower()]] = match.group(2)
+    return glossary
+
+
+def format_glossary(entries: dict[str, str]) -> str:
+    return "\n".join(f"{term} => {text}" for term, text in entries.items())
@@ -0,0 +1,254 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import IO
+
+import pymupdf
+
+from core.client.factory import endpoint_configs
+from core.extract import Block
+from core.metrics import Trace, job_trace
+from core.translate import translate_pdf_preserve_layout
+
+# Resolution of the previews of translated pages
+PREVIEW_DPI = 96
+
+
+def backend_key(config: dict) -> str:
+    """The endpoints a job sends requests to, as one key."""
+
+    return ",".join(
+        sorted({endpoint.get("base_url", "") for endpoint in endpoint_configs(config)})
+    )
+
+
+@dataclass
+class Job:
+    """A translation job and its progress, as seen by the UI."""
+
+    id: str
+    input_path: Path
+    output_path: Path
+    trace_path: Path
+    src_lang: str
+    tgt_lang: str
+    start_page: int
+    end_page: int
+    backend: str
+    priority_page: int | None = None
+    status: str = "queued"  # queued, running, done or failed
+    progress: int = 0
+    error: str | None = None
+    stats: dict | None = None
+    preview_page: int | None = None
+    # Streamed text per page, then per request by its first block index
+    preview: dict[int, dict[int, str]] = field(default_factory=dict)
+    # Pages written to the output so far, in the order they were finished
+    ready_pages: list[int] = field(default_factory=list)
+    created: float = field(default_factory=time.time)
+    finished: float | None = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def page_preview_path(self, page: int) -> Path:
+        return self.output_path.parent / "pages" / f"{page}.png"
+
+
+class JobManager:
+    """Run translation jobs on a local worker pool.
+
+    Uploads are written once to ``job_dir/uploads``, named by the hash of
+    their content, and read from there by every job translating them.
+    Every job gets its own directory under ``job_dir`` holding its output
+    and a JSON trace of its stages and requests. At most ``max_jobs`` jobs
+    run at once, and at most ``max_jobs_per_backend`` of them against the
+    same endpoints. Queued jobs start in order as soon as a worker and a
+    slot of their backend are free, so jobs for a busy backend don't hold
+    up those for idle ones. Finished jobs, and uploads unused for as long,
+    are removed after ``job_ttl`` seconds.
+    """
+
+    def __init__(self, config: dict):
+        self.job_dir = Path(config.get("job_dir", ".cache/jobs"))
+        self.upload_dir = self.job_dir / "uploads"
+        self.job_ttl = float(config.get("job_ttl", 24 * 3600))
+        self.max_jobs = int(config.get("max_jobs", 4))
+        self.max_jobs_per_backend = int(config.get("max_jobs_per_backend", 2))
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_jobs, thread_name_prefix="job"
+        )
+        self._jobs: dict[str, Job] = {}
+        # Jobs waiting for a slot, with their config and index, in order
+        self._queue: list[tuple[Job, dict, list[Block] | None]] = []
+        # Running jobs per backend
+        self._running: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def spool(self, upload: IO[bytes]) -> Path:
+        """Write ``upload`` to the uploads directory and return its path.
+
+        The file is copied in chunks and hashed on the way, and named by
+        its hash, so the same document uploaded again maps to the same file.
+        """
+
+        self.upload_dir.mkdir(parents=True, exist_ok=True)
+        h = hashlib.sha256()
+        upload.seek(0)
+        with tempfile.NamedTemporaryFile(
+            dir=self.upload_dir, suffix=".part", delete=False
+        ) as f:
+            for chunk in iter(lambda: upload.read(1 << 20), b""):
+                h.update(chunk)
+                f.write(chunk)
+        upload.seek(0)
+
+        path = self.upload_dir / f"{h.hexdigest()}.pdf"
+        os.replace(f.name, path)
+        return path
+
+    def submit(
+        self,
+        input_path: Path,
+        config: dict,
+        src_lang: str,
+        tgt_lang: str,
+        start_page: int,
+        end_page: int,
+        index: list[Block] | None = None,
+        priority_page: int | None = None,
+    ) -> str:
+        """Queue the PDF at ``input_path`` for translation and return the job id.
+
+        ``index``, the blocks of every page of the PDF if already extracted,
+        saves the job from extracting them again. With ``streaming`` set in
+        the config, pages are translated from ``priority_page`` on and each
+        finished page gets a preview image.
+        """
+
+        self.evict_finished()
+
+        job_id = uuid.uuid4().hex
+        job_path = self.job_dir / job_id
+        job_path.mkdir(parents=True)
+
+        job = Job(
+            id=job_id,
+            input_path=Path(input_path),
+            output_path=job_path / "output.pdf",
+            trace_path=job_path / "trace.json",
+            src_lang=src_lang,
+            tgt_lang=tgt_lang,
+            start_page=start_page,
+            end_page=end_page,
+            backend=backend_key(config),
+            priority_page=priority_page,
+        )
+        # Keep the upload from expiring while the job is queued or running
+        job.input_path.touch()
+
+        with self._lock:
+            self._jobs[job_id] = job
+            self._queue.append((job, config, index))
+        self._dispatch()
+        return job_id
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _dispatch(self) -> None:
+        """Start queued jobs, in order, while workers and backend slots are free."""
+
+        with self._lock:
+            for entry in list(self._queue):
+                if sum(self._running.values()) >= self.max_jobs:
+                    break
+                backend = entry[0].backend
+                if self._running.get(backend, 0) >= self.max_jobs_per_backend:
+                    continue
+                self._queue.remove(entry)
+                self._running[backend] = self._running.get(backend, 0) + 1
+                self._executor.submit(self._run, *entry)
+
+    def _run(self, job: Job, config: dict, index: list[Block] | None) -> None:
+        def report(progress: int) -> None:
+            job.progress = progress
+
+        preview_lock = threading.Lock()
+
+        def preview(page: int, idx: int, token: str) -> None:
+            with preview_lock:
+                texts = job.preview.setdefault(page, {})
+                texts[idx] = texts.get(idx, "") + token
+                job.preview_page = page
+
+        def page_ready(page: int, rendered: pymupdf.Page) -> None:
+            path = job.page_preview_path(page)
+            path.parent.mkdir(exist_ok=True)
+            rendered.get_pixmap(dpi=PREVIEW_DPI).save(path)
+            job.ready_pages.append(page)
+
+        job.status = "running"
+        trace = Trace(job.id, backend=job.backend)
+        try:
+            with job_trace(trace), open(job.input_path, "rb") as f:
+                job.stats = translate_pdf_preserve_layout(
+                    f,
+                    str(job.output_path),
+                    config,
+                    job.src_lang,
+                    job.tgt_lang,
+                    job.start_page,
+                    job.end_page,
+                    progress_callback=report,
+                    preview_callback=preview,
+                    index=index,
+                    priority_page=job.priority_page,
+                    page_callback=page_ready,
+                )
+            job.status = "done"
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            try:
+                trace.write(job.trace_path)
+            finally:
+                job.finished = time.time()
+                with self._lock:
+                    self._running[job.backend] -= 1
+                self._dispatch()
+
+    def evict_finished(self) -> None:
+        """Drop finished jobs, and their files, and uploads older than ``job_ttl``."""
+
+        cutoff = time.time() - self.job_ttl
+        with self._lock:
+            expired = [
+                job
+                for job in self._jobs.values()
+                if job.finished is not None and job.finished < cutoff
+            ]
+            for job in expired:
+                del self._jobs[job.id]
+
+        for job in expired:
+            shutil.rmtree(job.output_path.parent, ignore_errors=True)
+
+        if self.upload_dir.is_dir():
+            for path in self.upload_dir.iterdir():
+                try:
+                    if path.stat().st_mtime < cutoff:
+                        path.unlink()
+                except FileNotFoundError:
+                    pass
@@ -0,0 +1,285 @@
+import contextvars
+import json
+import threading
+import time
+from contextlib import contextmanager
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+PREFIX = "pdf_translator_"
+# Upper bounds of the histogram buckets, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+HELP = {
+    "stage_seconds": "Time spent in each stage of a job",
+    "job_seconds": "Time from the start to the end of a job",
+    "first_page_seconds": "Time from the start of a job to its first translated page",
+    "jobs_total": "Jobs finished, by status",
+    "llm_request_seconds": "Latency of LLM requests, queueing and retries included",
+    "llm_ttft_seconds": "Time to the first token of streamed LLM requests",
+    "llm_queue_wait_seconds": "Time requests waited for the endpoint limiter",
+    "llm_requests_total": "LLM requests, by outcome",
+    "llm_retries_total": "Retried LLM requests",
+    "llm_prompt_tokens_total": "Tokens sent to the LLM",
+    "llm_completion_tokens_total": "Tokens received from the LLM",
+    "cache_lookups_total": "Cache lookups, by cache and result",
+    "blocks_total": "Blocks seen by the layout pipelines, by outcome",
+}
+
+LabelSet = tuple[tuple[str, str], ...]
+
+
+def label_set(labels: dict) -> LabelSet:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def format_labels(labels: LabelSet, extra: tuple = ()) -> str:
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ""
+    escaped = (
+        (key, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in pairs
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+class Histogram:
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        for idx, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.buckets[idx] += 1
+                break
+
+
+class Registry:
+    """Thread-safe counters and histograms of the process, by label set."""
+
+    def __init__(self):
+        self._counters: dict[str, dict[LabelSet, float]] = {}
+        self._histograms: dict[str, dict[LabelSet, Histogram]] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, amount: float = 1, **labels) -> None:
+        key = label_set(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = label_set(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = Histogram()
+            series[key].observe(value)
+
+    def render(self) -> str:
+        """Every metric in the Prometheus text exposition format."""
+
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                lines.append(f"# HELP {PREFIX}{name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {PREFIX}{name} counter")
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{PREFIX}{name}{format_labels(labels)} {value:g}")
+
+            for name, series in sorted(self._histograms.items()):
+                lines.append(f"# HELP {PREFIX}{name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {PREFIX}{name} histogram")
+                for labels, hist in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(BUCKETS, hist.buckets):
+                        cumulative += count
+                        le = format_labels(labels, (("le", f"{bound:g}"),))
+                        lines.append(f"{PREFIX}{name}_bucket{le} {cumulative}")
+                    le = format_labels(labels, (("le", "+Inf"),))
+                    lines.append(f"{PREFIX}{name}_bucket{le} {hist.count}")
+                    lines.append(
+                        f"{PREFIX}{name}_sum{format_labels(labels)} {hist.sum:g}"
+                    )
+                    lines.append(
+                        f"{PREFIX}{name}_count{format_labels(labels)} {hist.count}"
+                    )
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class Trace:
+    """Spans and counters of one job, written out as JSON."""
+
+    def __init__(self, job_id: str, **attrs):
+        self.job_id = job_id
+        self.attrs = attrs
+        self.started = time.time()
+        self.seconds: float | None = None
+        self.status = "running"
+        self.spans: list[dict] = []
+        self.counters: dict[str, float] = {}
+        self._clock = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add_span(self, name: str, started: float, seconds: float, **attrs) -> None:
+        """Record a span that began at ``started``, a ``time.perf_counter`` value."""
+
+        span = {
+            "name": name,
+            "start": round(started - self._clock, 6),
+            "seconds": round(seconds, 6),
+            "thread": threading.current_thread().name,
+        }
+        if attrs:
+            span["attrs"] = attrs
+        with self._lock:
+            self.spans.append(span)
+
+    def count(self, name: str, amount: float = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def finish(self, status: str) -> None:
+        self.status = status
+        self.seconds = time.perf_counter() - self._clock
+
+    def stages(self) -> dict[str, float]:
+        """Total seconds per span name, overlapping spans summed."""
+
+        totals: dict[str, float] = {}
+        with self._lock:
+            for span in self.spans:
+                totals[span["name"]] = totals.get(span["name"], 0.0) + span["seconds"]
+        return totals
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "job_id": self.job_id,
+                "status": self.status,
+                "started": self.started,
+                "seconds": self.seconds,
+                "attrs": self.attrs,
+                "counters": dict(self.counters),
+                "spans": sorted(self.spans, key=lambda span: span["start"]),
+            }
+
+    def write(self, path: str | Path) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=1)
+
+
+_trace: contextvars.ContextVar[Trace | None] = contextvars.ContextVar(
+    "trace", default=None
+)
+
+
+def current_trace() -> Trace | None:
+    return _trace.get()
+
+
+@contextmanager
+def job_trace(trace: Trace) -> Iterator[Trace]:
+    """Record the spans of the code run within, and its threads, in ``trace``.
+
+    Threads only see the trace when started with ``in_context``; asyncio
+    tasks and ``asyncio.to_thread`` copy it by themselves.
+    """
+
+    token = _trace.set(trace)
+    status = "failed"
+    try:
+        yield trace
+        status = "done"
+    finally:
+        _trace.reset(token)
+        trace.finish(status)
+        REGISTRY.inc("jobs_total", status=status)
+        REGISTRY.observe("job_seconds", trace.seconds)
+
+
+def in_context(fn: Callable[..., T]) -> Callable[..., T]:
+    """``fn`` run in a copy of the current context, e.g. on a worker thread.
+
+    Each call of ``in_context`` makes a new copy, so use the returned
+    function for a single call.
+    """
+
+    return partial(contextvars.copy_context().run, fn)
+
+
+@contextmanager
+def span(stage: str, **attrs) -> Iterator[dict]:
+    """Time a stage of a job into ``stage_seconds`` and the current trace.
+
+    Attributes added to the yielded dict are recorded with the span.
+    """
+
+    started = time.perf_counter()
+    try:
+        yield attrs
+    finally:
+        seconds = time.perf_counter() - started
+        REGISTRY.observe("stage_seconds", seconds, stage=stage)
+        trace = current_trace()
+        if trace is not None:
+            trace.add_span(stage, started, seconds, **attrs)
+
+
+def count(name: str, amount: float = 1, **labels) -> None:
+    """Add to a counter, and to the counter of the current trace if any."""
+
+    REGISTRY.inc(name, amount, **labels)
+    trace = current_trace()
+    if trace is not None:
+        trace.count(f"{name}{format_labels(label_set(labels))}", amount)
+
+
+def observe(name: str, value: float, **labels) -> None:
+    REGISTRY.observe(name, value, **labels)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+_server: ThreadingHTTPServer | None = None
+_server_lock = threading.Lock()
+
+
+def serve_metrics(port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serve ``/metrics`` on a background thread, once per process."""
+
+    global _server
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), MetricsHandler)
+            _server.daemon_threads = True
+            threading.Thread(
+                target=_server.serve_forever, name="metrics", daemon=True
+            ).start()
+        return _server
@@ -1,3 +1,42 @@
+from functools import lru_cache
+
+import tiktoken
+
+# Bump whenever a prompt changes so cached translations are not reused
+PROMPT_VERSION = "3"
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+@lru_cache
+def _encoding(model: str | None):
+    try:
+        # Models tiktoken does not know, such as those served by Ollama, have
+        # tokenizers of their own; o200k_base approximates them
+        try:
+            return tiktoken.encoding_for_model(model or "")
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        # The encoding could not be loaded, e.g. offline without a cache
+        return None
+
+
+def count_tokens(text: str, model: str | None = None) -> int:
+    """Token count of ``text`` for ``model``.
+
+    Exact for OpenAI models. Other models are counted with the o200k_base
+    encoding, an approximation of their own tokenizers. Falls back to
+    ``estimate_tokens`` when tiktoken cannot load its encoding.
+    """
+    encoding = _encoding(model)
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
 def summarize_prompt(chunk: str) -> str:
     prompt = f"""
     ### Instructions
@@ -26,25 +65,88 @@ def translate_prompt(chunk: str, source_lang: str, target_lang: str) -> str:
     return prompt
 
 
-def translate_prompt_with_context(
-    chunk: str,
-    summary: str,
-    source_lang: str,
-    target_lang: str,
-) -> str:
+def translate_prompt_prefix(summary: str, source_lang: str, target_lang: str) -> str:
+    """Instructions and context shared by every translation request of a job.
+
+    Prompts start with this exact text and only then differ, so backends
+    caching prompt prefixes (Ollama's KV cache, OpenAI prompt caching) can
+    reuse it across requests.
+    """
     prompt = f"""
     ### Instructions
-    Translate the provided text from {source_lang} to {target_lang}.
+    Translate the text from {source_lang} to {target_lang}.
     Keep in mind the context provided, to help with translation.
     Don't translate names, dates, numbers, or formulas.
-    Output only the translated text with no explanations or extra phrases.
+    Translate the terms listed in the glossary, if any, as given there.
+    If the text is split into segments numbered with <<n>> markers, repeat
+    every marker unchanged on its own line, in the same order, followed by
+    the translation of that segment only.
+    Output only the translation with no explanations or extra phrases.
 
     ### Context
     {summary}
+    """
+    return prompt
+
+
+def glossary_section(glossary: str) -> str:
+    """Glossary entries of a request, placed after the shared prompt prefix."""
+    if not glossary:
+        return ""
+    return f"""
+    ### Glossary
+    {glossary}
+    """
 
+
+def translate_prompt_with_context(
+    chunk: str,
+    summary: str,
+    source_lang: str,
+    target_lang: str,
+    glossary: str = "",
+) -> str:
+    prompt = f"""{translate_prompt_prefix(summary, source_lang, target_lang)}{glossary_section(glossary)}
     ### Text
     {chunk}
 
     ### Translation
     """
     return prompt
+
+
+def translate_prompt_batch(
+    chunks: list[str],
+    summary: str,
+    source_lang: str,
+    target_lang: str,
+    glossary: str = "",
+) -> str:
+    segments = "\n".join(
+        f"<<{idx}>>\n{chunk.strip()}" for idx, chunk in enumerate(chunks, start=1)
+    )
+    prompt = f"""{translate_prompt_prefix(summary, source_lang, target_lang)}{glossary_section(glossary)}
+    ### Segments
+    {segments}
+
+    ### Translation
+    """
+    return prompt
+
+
+def glossary_prompt(terms: list[str], source_lang: str, target_lang: str) -> str:
+    listed = "\n".join(terms)
+    prompt = f"""
+    ### Instructions
+    Translate each of the following technical terms from {source_lang} to {target_lang},
+    as they would be written in a technical document.
+    Keep acronyms, names and terms usually left untranslated as they are.
+    Output one line per term, as: term => translation
+    Output only these lines with no explanations or extra phrases.
+
+    ### Terms
+    {listed}
+
+    ### Translations
+    """
+    return prompt
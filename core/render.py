@@ -0,0 +1,215 @@
+import bisect
+import html
+import io
+import os
+import tempfile
+import time
+from functools import lru_cache
+from pathlib import Path
+
+import pymupdf
+
+from core import metrics
+from core.extract import Block, file_path
+from core.shard import run_shards, shard_pages
+
+FONT_FILE = "fonts/Yekan.ttf"
+CSS = """@font-face {font-family: sans-serif; src: url("%s");}
+    body {font-family:sans-serif; margin:1px;} """ % os.path.basename(FONT_FILE)
+
+# Smallest font size translations are shrunk to when they don't fit their rect
+MIN_FONT_SIZE = 4
+# Precision of the fit, as a fraction of the font size
+FIT_PRECISION = 0.02
+
+
+@lru_cache(maxsize=1)
+def font_archive() -> pymupdf.Archive:
+    """Archive holding the font, read from disk once per process."""
+
+    archive = pymupdf.Archive()
+    if os.path.isfile(FONT_FILE):
+        with open(FONT_FILE, "rb") as f:
+            archive.add(f.read(), os.path.basename(FONT_FILE))
+    return archive
+
+
+def block_story(block: Block, text: str) -> pymupdf.Story:
+    # Start from the size of the source text, fit_block shrinks it when needed
+    size = max(block.font_size, MIN_FONT_SIZE)
+    body = html.escape(text).replace("\n", "<br>")
+    return pymupdf.Story(
+        html=f'<div dir="rtl" style="font-size:{size:.1f}px">{body}</div>',
+        user_css=CSS,
+        archive=font_archive(),
+    )
+
+
+def fit_block(story: pymupdf.Story, rect: pymupdf.Rect, font_size: float) -> float:
+    """Place ``story`` so that it fits ``rect`` and return its scale.
+
+    Searches how much larger than ``rect`` the story's rect has to be to
+    hold the text, which is the factor the font size is shrunk by when the
+    story is drawn back into ``rect``.
+    """
+
+    fit = story.fit_scale(
+        pymupdf.Rect(0, 0, rect.width, rect.height),
+        scale_min=1,
+        scale_max=max(font_size / MIN_FONT_SIZE, 1),
+        delta=FIT_PRECISION,
+        flags=pymupdf.mupdf.FZ_PLACE_STORY_FLAG_NO_OVERFLOW,
+    )
+    if not fit.big_enough:
+        # Too long even at the smallest size, the overflow is cut off
+        story.reset()
+        story.place(fit.rect)
+    return 1 / fit.parameter
+
+
+def render_page(page: pymupdf.Page, items: list[tuple[Block, str]]) -> None:
+    """Replace the text of each block on ``page`` with its translation.
+
+    Every translation of the page is drawn onto one overlay page, which is
+    then shown on ``page`` at once.
+    """
+
+    rects = [pymupdf.Rect(block.rect) for block, _ in items]
+    for rect in rects:
+        page.add_redact_annot(rect, fill=(1, 1, 1))
+
+    # Remove only the original text
+    page.apply_redactions(images=0, graphics=0, text=0)
+
+    buffer = io.BytesIO()
+    writer = pymupdf.DocumentWriter(buffer)
+    device = writer.begin_page(page.rect)
+    for rect, (block, text) in zip(rects, items):
+        if rect.is_empty:
+            continue
+        story = block_story(block, text)
+        scale = fit_block(story, rect, block.font_size)
+        story.draw(device, pymupdf.Matrix(scale, 0, 0, scale, rect.x0, rect.y0))
+    writer.end_page()
+    writer.close()
+
+    overlay = pymupdf.open("pdf", buffer.getvalue())
+    page.show_pdf_page(page.rect, overlay, 0)
+    overlay.close()
+
+
+def render_blocks(
+    doc: pymupdf.Document,
+    blocks: list[Block],
+    translations: list[str],
+    first_page: int = 0,
+) -> list[float]:
+    """Render translations onto ``doc``, whose first page is source page ``first_page``.
+
+    Fonts are subset once the pages are rendered. Returns the seconds spent
+    rendering each page.
+    """
+
+    page_items: dict[int, list[tuple[Block, str]]] = {}
+    for block, text in zip(blocks, translations):
+        page_items.setdefault(block.page, []).append((block, text))
+
+    seconds = []
+    with metrics.span("render", pages=len(page_items)):
+        for pno, items in page_items.items():
+            started = time.perf_counter()
+            render_page(doc[pno - first_page], items)
+            seconds.append(time.perf_counter() - started)
+
+        if page_items:
+            doc.subset_fonts()
+    return seconds
+
+
+def render_shard(
+    path: str,
+    part_path: str,
+    pages: range,
+    blocks: list[Block],
+    translations: list[str],
+) -> list[float]:
+    """Render ``pages`` of the PDF at ``path`` into ``part_path``, in a worker process."""
+
+    with pymupdf.open(path) as doc:
+        part = pymupdf.open()
+        part.insert_pdf(doc, from_page=pages[0], to_page=pages[-1])
+    seconds = render_blocks(part, blocks, translations, first_page=pages[0])
+    part.save(part_path)
+    part.close()
+    return seconds
+
+
+def render_document(
+    doc: pymupdf.Document,
+    output_path: str,
+    blocks: list[Block],
+    translations: list[str],
+    pages: range,
+    workers: int = 1,
+) -> list[float]:
+    """Write ``pages`` of ``doc`` with their translations rendered to ``output_path``.
+
+    ``blocks`` are in page order. With several ``workers`` and ``doc``
+    opened from disk, page ranges are rendered by worker processes, each
+    from the source file and only the blocks of its pages, and merged into
+    the output in order. Otherwise ``doc`` itself is rendered and saved.
+    Returns the seconds spent rendering each page.
+    """
+
+    path = file_path(doc)
+    shards = shard_pages(pages, workers) if path is not None else [pages]
+    if len(shards) == 1:
+        doc.select(list(pages))
+        seconds = render_blocks(doc, blocks, translations, first_page=pages.start)
+        with metrics.span("save"):
+            doc.save(output_path)
+        return seconds
+
+    with tempfile.TemporaryDirectory() as tmp:
+        args = []
+        start = 0
+        for idx, shard in enumerate(shards):
+            stop = bisect.bisect_right(
+                blocks, shard[-1], lo=start, key=lambda block: block.page
+            )
+            part_path = str(Path(tmp) / f"{idx}.pdf")
+            args.append(
+                (path, part_path, shard, blocks[start:stop], translations[start:stop])
+            )
+            start = stop
+
+        with metrics.span("render", pages=len(pages), shards=len(shards)):
+            seconds = run_shards(render_shard, args, workers)
+
+        with metrics.span("save"):
+            out = pymupdf.open()
+            for _, part_path, *_ in args:
+                with pymupdf.open(part_path) as part:
+                    out.insert_pdf(part)
+            out.save(output_path)
+            out.close()
+    return [sec for shard_seconds in seconds for sec in shard_seconds]
+
+
+def append_pages(
+    part: pymupdf.Document, output_path: str, create: bool, start_at: int = -1
+) -> None:
+    """Write ``part`` to ``output_path``, or insert it with an incremental save.
+
+    The pages of ``part`` are inserted before page ``start_at`` of the
+    output, or appended when it is -1.
+    """
+
+    if create:
+        part.save(output_path)
+        return
+
+    out = pymupdf.open(output_path)
+    out.insert_pdf(part, start_at=start_at)
+    out.saveIncr()
+    out.close()
@@ -0,0 +1,66 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from typing import Callable, Sequence, TypeVar
+
+T = TypeVar("T")
+
+# Fewest pages worth handing to a worker process
+MIN_SHARD_PAGES = 8
+
+
+def pdf_workers(config: dict) -> int:
+    """Worker processes for PyMuPDF work, ``pdf_workers`` with 0 for every core."""
+
+    workers = int(config.get("pdf_workers", 1))
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    return workers
+
+
+def shard_pages(pages: Sequence[int], workers: int) -> list[Sequence[int]]:
+    """Split ``pages`` into up to ``workers`` contiguous ranges of similar length.
+
+    Ranges hold at least ``MIN_SHARD_PAGES`` pages, so small documents
+    stay in a single range and are processed in-process.
+    """
+
+    shards = max(1, min(workers, len(pages) // MIN_SHARD_PAGES))
+    bounds = [len(pages) * idx // shards for idx in range(shards + 1)]
+    return [pages[start:stop] for start, stop in zip(bounds, bounds[1:])]
+
+
+@lru_cache(maxsize=None)
+def process_pool(workers: int) -> ProcessPoolExecutor:
+    """Pool of ``workers`` processes, started once and shared by every job.
+
+    Processes are spawned rather than forked, as the web app and the
+    pipelines fork from threads holding locks.
+    """
+
+    return ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+def run_shards(fn: Callable[..., T], shards: list[tuple], workers: int) -> list[T]:
+    """Results of ``fn(*args)`` for the ``args`` of each shard, in order.
+
+    Shards run on the process pool, so ``fn`` and its arguments must be
+    picklable. Shards not started yet are cancelled when one fails.
+    """
+
+    pool = process_pool(workers)
+    futures = [pool.submit(fn, *args) for args in shards]
+    try:
+        return [future.result() for future in futures]
+    except BrokenProcessPool:
+        # A worker died, start a new pool for the next job
+        pool.shutdown(wait=False)
+        process_pool.cache_clear()
+        raise
+    finally:
+        for future in futures:
+            future.cancel()
@@ -1,8 +1,13 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import IO, Callable, Tuple
 
+from core import metrics
+from core.cache import SummaryCache, content_hash, file_fingerprint
+from core.chunk import chunk_blocks
 from core.client.base import BaseClient
-from core.extract import extract_text
-from core.prompt import summarize_prompt
+from core.extract import Block, extract_text, get_page_count
+from core.prompt import PROMPT_VERSION, count_tokens, summarize_prompt
 
 
 def summarize_chunk(chunk: str, client: BaseClient = None) -> str:
@@ -15,43 +20,476 @@ def summarize_chunk(chunk: str, client: BaseClient = None) -> str:
     return resp
 
 
-def summarize_doc(
-    pdf_file: IO[bytes],
+def group_summaries(
+    summaries: list[str], chunk_tokens: int, model: str | None = None
+) -> list[list[str]]:
+    """Group consecutive summaries into chunks of about ``chunk_tokens`` tokens.
+
+    Every group but the last holds at least two summaries, so each reduce
+    level strictly shrinks the number of summaries.
+    """
+
+    groups: list[list[str]] = []
+    current: list[str] = []
+    current_size = 0
+
+    for summary in summaries:
+        tokens = count_tokens(summary, model)
+        if len(current) >= 2 and current_size + tokens > chunk_tokens:
+            groups.append(current)
+            current, current_size = [], 0
+        current.append(summary)
+        current_size += tokens
+
+    if current:
+        groups.append(current)
+    return groups
+
+
+def reduce_summaries(
+    summaries: list[str],
+    client: BaseClient = None,
+    chunk_tokens: int = 2500,
+    max_workers: int = 1,
+) -> str:
+    """Summarize groups of summaries level by level until one is left."""
+
+    if not summaries:
+        return ""
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        while len(summaries) > 1:
+            groups = group_summaries(
+                summaries, chunk_tokens, getattr(client, "model", None)
+            )
+            futures = [
+                executor.submit(
+                    metrics.in_context(summarize_chunk), "\n".join(group), client
+                )
+                for group in groups
+            ]
+            summaries = [future.result() for future in futures]
+
+    return summaries[0]
+
+
+def summarize_chunks(
+    chunks: list[str],
+    client: BaseClient = None,
+    progress_callback: Callable[[int], None] | None = None,
+    progress_range: Tuple[int, int] = (0, 20),
+    max_workers: int = 1,
+    chunk_tokens: int = 2500,
+    cache: SummaryCache | None = None,
+) -> str:
+    """Summarize chunks concurrently, then reduce them into one summary.
+
+    Chunk summaries are looked up in ``cache`` first.
+    """
+
+    # Client should be provided beforehand
+    if client is None:
+        return ""
+
+    summaries = [None] * len(chunks)
+
+    chunk_keys = [
+        content_hash("chunk", chunk, client.model, PROMPT_VERSION) for chunk in chunks
+    ]
+    if cache is not None:
+        summaries = [cache.get(key) for key in chunk_keys]
+
+    total_chunks = len(chunks)
+    start, end = progress_range
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = [
+            executor.submit(metrics.in_context(summarize_chunk), chunk, client)
+            if summary is None
+            else None
+            for chunk, summary in zip(chunks, summaries)
+        ]
+        for idx, future in enumerate(futures, start=1):
+            if future is not None:
+                summary = future.result()
+                summaries[idx - 1] = summary
+                if cache is not None:
+                    cache.put(chunk_keys[idx - 1], summary)
+
+            if progress_callback and total_chunks:
+                progress = start + (end - start) * idx / total_chunks
+                progress_callback(int(progress))
+
+    if not summaries:
+        if progress_callback:
+            progress_callback(end)
+        return ""
+
+    return reduce_summaries(summaries, client, chunk_tokens, max_workers)
+
+
+def summarize_blocks(
+    blocks: list[Block],
+    client: BaseClient = None,
+    progress_callback: Callable[[int], None] | None = None,
+    progress_range: Tuple[int, int] = (0, 20),
+    max_workers: int = 1,
+    chunk_tokens: int = 2500,
+    cache: SummaryCache | None = None,
+) -> str:
+    """Summarize the text of an extracted block index.
+
+    The summary is cached under the hashes of the blocks it covers.
+    """
+
+    # Client should be provided beforehand
+    if client is None:
+        return ""
+
+    doc_key = None
+    if cache is not None:
+        doc_key = content_hash(
+            "blocks",
+            *(block.hash for block in blocks),
+            str(chunk_tokens),
+            client.model,
+            PROMPT_VERSION,
+        )
+        summary = cache.get(doc_key)
+        if summary is not None:
+            if progress_callback:
+                progress_callback(progress_range[1])
+            return summary
+
+    summary = summarize_chunks(
+        chunk_blocks(blocks, chunk_tokens, client.model),
+        client,
+        progress_callback=progress_callback,
+        progress_range=progress_range,
+        max_workers=max_workers,
+        chunk_tokens=chunk_tokens,
+        cache=cache,
+    )
+    if cache is not None:
+        cache.put(doc_key, summary)
+
+    return summary
+
+
+def summarize_sections(
+    sections: dict[int, list[Block]],
+    client: BaseClient = None,
+    progress_callback: Callable[[int], None] | None = None,
+    progress_range: Tuple[int, int] = (0, 20),
+    max_workers: int = 1,
+    chunk_tokens: int = 2500,
+    cache: SummaryCache | None = None,
+) -> dict[int, str]:
+    """Summarize each section of a block index on its own.
+
+    A single section is summarized with ``summarize_blocks``; several are
+    summarized in parallel, ``max_workers`` sections at a time.
+    """
+
+    if len(sections) <= 1:
+        return {
+            section: summarize_blocks(
+                blocks,
+                client,
+                progress_callback=progress_callback,
+                progress_range=progress_range,
+                max_workers=max_workers,
+                chunk_tokens=chunk_tokens,
+                cache=cache,
+            )
+            for section, blocks in sections.items()
+        }
+
+    start, end = progress_range
+    summaries = {}
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = {
+            executor.submit(
+                metrics.in_context(summarize_blocks),
+                blocks,
+                client,
+                chunk_tokens=chunk_tokens,
+                cache=cache,
+            ): section
+            for section, blocks in sections.items()
+        }
+        try:
+            for done, future in enumerate(as_completed(futures), start=1):
+                summaries[futures[future]] = future.result()
+                if progress_callback:
+                    progress_callback(int(start + (end - start) * done / len(futures)))
+        except BaseException:
+            executor.shutdown(cancel_futures=True)
+            raise
+
+    return summaries
+
+
+async def asummarize_chunk(chunk: str, client: BaseClient = None) -> str:
+    # Client should be provided beforehand
+    if client is None:
+        return ""
+
+    prompt = summarize_prompt(chunk)
+    resp = await client.aask(prompt)
+    return resp
+
+
+async def areduce_summaries(
+    summaries: list[str],
+    client: BaseClient = None,
+    chunk_tokens: int = 2500,
+    max_concurrency: int = 64,
+) -> str:
+    """Async version of ``reduce_summaries``."""
+
+    if not summaries:
+        return ""
+
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def run(group: list[str]) -> str:
+        async with semaphore:
+            return await asummarize_chunk("\n".join(group), client)
+
+    while len(summaries) > 1:
+        groups = group_summaries(
+            summaries, chunk_tokens, getattr(client, "model", None)
+        )
+        summaries = list(await asyncio.gather(*(run(group) for group in groups)))
+
+    return summaries[0]
+
+
+async def asummarize_chunks(
+    chunks: list[str],
     client: BaseClient = None,
     progress_callback: Callable[[int], None] | None = None,
     progress_range: Tuple[int, int] = (0, 20),
+    max_concurrency: int = 64,
+    chunk_tokens: int = 2500,
+    cache: SummaryCache | None = None,
 ) -> str:
-    """Summarize a document with optional progress updates."""
+    """Async version of ``summarize_chunks``."""
 
     # Client should be provided beforehand
     if client is None:
         return ""
 
-    docs = extract_text(pdf_file, chunk_size=10000)
-    summaries = []
+    summaries = [None] * len(chunks)
+
+    chunk_keys = [
+        content_hash("chunk", chunk, client.model, PROMPT_VERSION) for chunk in chunks
+    ]
+    if cache is not None:
+        # SQLite calls block, keep them off the event loop
+        summaries = await asyncio.to_thread(
+            lambda: [cache.get(key) for key in chunk_keys]
+        )
 
-    total_chunks = len(docs)
+    total_chunks = len(chunks)
     start, end = progress_range
+    done = 0
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
 
-    for idx, doc in enumerate(docs, start=1):
-        summary = summarize_chunk(doc, client)
-        print("summary:", summary)
-        summaries.append(summary)
+    async def run(idx: int) -> None:
+        nonlocal done
+        if summaries[idx] is None:
+            async with semaphore:
+                summaries[idx] = await asummarize_chunk(chunks[idx], client)
+            if cache is not None:
+                await asyncio.to_thread(cache.put, chunk_keys[idx], summaries[idx])
 
+        done += 1
         if progress_callback and total_chunks:
-            progress = start + (end - start) * idx / total_chunks
+            progress = start + (end - start) * done / total_chunks
             progress_callback(int(progress))
 
+    await asyncio.gather(*(run(idx) for idx in range(total_chunks)))
+
     if not summaries:
         if progress_callback:
             progress_callback(end)
         return ""
 
-    all_summaries = "\n".join(summaries)
+    return await areduce_summaries(summaries, client, chunk_tokens, max_concurrency)
+
 
-    if len(summaries) > 1:
-        summary = summarize_chunk(all_summaries)
-    else:
-        summary = all_summaries
+async def asummarize_blocks(
+    blocks: list[Block],
+    client: BaseClient = None,
+    progress_callback: Callable[[int], None] | None = None,
+    progress_range: Tuple[int, int] = (0, 20),
+    max_concurrency: int = 64,
+    chunk_tokens: int = 2500,
+    cache: SummaryCache | None = None,
+) -> str:
+    """Async version of ``summarize_blocks``."""
+
+    # Client should be provided beforehand
+    if client is None:
+        return ""
+
+    doc_key = None
+    if cache is not None:
+        doc_key = content_hash(
+            "blocks",
+            *(block.hash for block in blocks),
+            str(chunk_tokens),
+            client.model,
+            PROMPT_VERSION,
+        )
+        summary = await asyncio.to_thread(cache.get, doc_key)
+        if summary is not None:
+            if progress_callback:
+                progress_callback(progress_range[1])
+            return summary
+
+    summary = await asummarize_chunks(
+        chunk_blocks(blocks, chunk_tokens, client.model),
+        client,
+        progress_callback=progress_callback,
+        progress_range=progress_range,
+        max_concurrency=max_concurrency,
+        chunk_tokens=chunk_tokens,
+        cache=cache,
+    )
+    if cache is not None:
+        await asyncio.to_thread(cache.put, doc_key, summary)
 
     return summary
+
+
+def summarize_doc(
+    pdf_file: IO[bytes],
+    client: BaseClient = None,
+    progress_callback: Callable[[int], None] | None = None,
+    progress_range: Tuple[int, int] = (0, 20),
+    start_page: int | None = None,
+    end_page: int | None = None,
+    window: int = 0,
+    max_workers: int = 1,
+    chunk_tokens: int = 2500,
+    cache: SummaryCache | None = None,
+    pdf_workers: int = 1,
+) -> str:
+    """Summarize a document with optional progress updates.
+
+    Only pages within ``start_page`` and ``end_page`` (1-indexed, inclusive),
+    widened by ``window`` pages on each side, are summarized. Both the
+    document summary and the chunk summaries are looked up in ``cache``
+    first. The markdown of the pages is extracted by up to ``pdf_workers``
+    processes.
+    """
+
+    # Client should be provided beforehand
+    if client is None:
+        return ""
+
+    pages = None
+    if start_page is not None or end_page is not None:
+        page_count = get_page_count(pdf_file)
+        pdf_file.seek(0)
+        first = max(1, (start_page or 1) - window)
+        last = min(page_count, (end_page or page_count) + window)
+        pages = list(range(first - 1, last))
+
+    doc_key = None
+    if cache is not None:
+        doc_key = content_hash(
+            "document",
+            file_fingerprint(pdf_file),
+            repr(pages),
+            str(chunk_tokens),
+            client.model,
+            PROMPT_VERSION,
+        )
+        summary = cache.get(doc_key)
+        if summary is not None:
+            if progress_callback:
+                progress_callback(progress_range[1])
+            return summary
+
+    with metrics.span("summarize") as attrs:
+        docs = extract_text(
+            pdf_file,
+            chunk_tokens=chunk_tokens,
+            pages=pages,
+            model=client.model,
+            workers=pdf_workers,
+        )
+        summary = summarize_chunks(
+            [doc.page_content for doc in docs],
+            client,
+            progress_callback=progress_callback,
+            progress_range=progress_range,
+            max_workers=max_workers,
+            chunk_tokens=chunk_tokens,
+            cache=cache,
+        )
+        attrs["chunks"] = len(docs)
+        attrs["summary_tokens"] = count_tokens(summary, client.model)
+    if cache is not None:
+        cache.put(doc_key, summary)
+
+    return summary
+
+
+async def asummarize_sections(
+    sections: dict[int, list[Block]],
+    client: BaseClient = None,
+    progress_callback: Callable[[int], None] | None = None,
+    progress_range: Tuple[int, int] = (0, 20),
+    max_concurrency: int = 64,
+    chunk_tokens: int = 2500,
+    cache: SummaryCache | None = None,
+) -> dict[int, str]:
+    """Async version of ``summarize_sections``."""
+
+    if len(sections) <= 1:
+        return {
+            section: await asummarize_blocks(
+                blocks,
+                client,
+                progress_callback=progress_callback,
+                progress_range=progress_range,
+                max_concurrency=max_concurrency,
+                chunk_tokens=chunk_tokens,
+                cache=cache,
+            )
+            for section, blocks in sections.items()
+        }
+
+    start, end = progress_range
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def run(section: int) -> tuple[int, str]:
+        async with semaphore:
+            summary = await asummarize_blocks(
+                sections[section],
+                client,
+                max_concurrency=1,
+                chunk_tokens=chunk_tokens,
+                cache=cache,
+            )
+        return section, summary
+
+    summaries = {}
+    tasks = [asyncio.ensure_future(run(section)) for section in sections]
+    try:
+        for done, next_done in enumerate(asyncio.as_completed(tasks), start=1):
+            section, summary = await next_done
+            summaries[section] = summary
+            if progress_callback:
+                progress_callback(int(start + (end - start) * done / len(tasks)))
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+    return summaries
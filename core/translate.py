@@ -1,12 +1,62 @@
-from typing import IO, Callable
+import asyncio
+import bisect
+import json
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+from typing import IO, Callable, Self, Tuple
 
 import pymupdf
 
+from core import metrics
+from core.cache import (
+    SummaryCache,
+    TranslationMemory,
+    content_hash,
+    open_summary_cache,
+    open_translation_memory,
+    translation_key,
+)
+from core.checkpoint import SUMMARY_KEY, Checkpoint, open_checkpoint
+from core.chunk import join_pieces, split_chunks
+from core.classify import filter_blocks
 from core.client.base import BaseClient
-from core.client.ollama import OllamaClient
-from core.extract import extract_text
-from core.prompt import translate_prompt, translate_prompt_with_context
-from core.summarize import summarize_doc
+from core.client.factory import create_client
+from core.context import block_contexts, cap_summary, context_settings, group_sections
+from core.extract import (
+    PDF_LOCK,
+    Block,
+    build_block_index,
+    extract_text,
+    open_document,
+)
+from core.glossary import (
+    TermIndex,
+    extract_terms,
+    format_glossary,
+    load_glossary,
+    parse_glossary,
+)
+from core.prompt import (
+    PROMPT_VERSION,
+    count_tokens,
+    glossary_prompt,
+    translate_prompt,
+    translate_prompt_batch,
+    translate_prompt_with_context,
+)
+from core.render import append_pages, render_blocks, render_document
+from core.shard import pdf_workers
+from core.summarize import asummarize_sections, summarize_doc, summarize_sections
+
+BATCH_MARKER = re.compile(r"^\s*<<(\d+)>>\s*$", re.MULTILINE)
+
+
+def config_flag(value) -> bool:
+    return str(value).lower() in ("1", "true", "yes", "on")
 
 
 def translate_chunk(
@@ -25,14 +75,1099 @@ def translate_chunk_with_context(
     source_lang: str,
     target_lang: str,
     client: BaseClient = None,
+    on_token: Callable[[str], None] | None = None,
+    glossary: str = "",
 ) -> str:
     if client is None:
         return ""
-    prompt = translate_prompt_with_context(chunk, summary, source_lang, target_lang)
+    prompt = translate_prompt_with_context(
+        chunk, summary, source_lang, target_lang, glossary
+    )
+    if on_token:
+        return client.ask_stream(prompt, on_token)
     resp = client.ask(prompt)
     return resp
 
 
+def split_batch_response(resp: str, count: int) -> list[str] | None:
+    """Split a batched response into ``count`` translations, or None if malformed."""
+
+    parts = BATCH_MARKER.split(resp)
+    # parts = [preamble, "1", text1, "2", text2, ...]
+    indices = parts[1::2]
+    texts = [text.strip() for text in parts[2::2]]
+
+    if indices != [str(idx) for idx in range(1, count + 1)]:
+        return None
+    if not all(texts):
+        return None
+    return texts
+
+
+def translate_batch_with_context(
+    chunks: list[str],
+    summary: str,
+    source_lang: str,
+    target_lang: str,
+    client: BaseClient = None,
+    on_token: Callable[[str], None] | None = None,
+    glossary: str = "",
+) -> list[str]:
+    """Translate several chunks in one request.
+
+    Falls back to one request per chunk if the response can't be split.
+    """
+
+    if client is None:
+        return [""] * len(chunks)
+    if len(chunks) == 1:
+        return [
+            translate_chunk_with_context(
+                chunks[0], summary, source_lang, target_lang, client, on_token, glossary
+            )
+        ]
+
+    prompt = translate_prompt_batch(chunks, summary, source_lang, target_lang, glossary)
+    if on_token:
+        resp = client.ask_stream(prompt, on_token)
+    else:
+        resp = client.ask(prompt)
+    translations = split_batch_response(resp, len(chunks))
+    if translations is not None:
+        return translations
+
+    return [
+        translate_chunk_with_context(
+            chunk, summary, source_lang, target_lang, client, on_token, glossary
+        )
+        for chunk in chunks
+    ]
+
+
+def pack_batches(
+    chunks: list[str], batch_tokens: int, model: str | None = None
+) -> list[list[int]]:
+    """Group chunk indices into batches of at most ``batch_tokens`` tokens.
+
+    Chunks too large to share a batch are sent alone. A budget of zero
+    disables batching.
+    """
+
+    batches: list[list[int]] = []
+    current: list[int] = []
+    current_tokens = 0
+
+    for idx, chunk in enumerate(chunks):
+        tokens = count_tokens(chunk, model)
+        if tokens * 2 > batch_tokens:
+            batches.append([idx])
+            continue
+        if current and current_tokens + tokens > batch_tokens:
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(idx)
+        current_tokens += tokens
+
+    if current:
+        batches.append(current)
+    return batches
+
+
+def pack_context_batches(
+    chunks: list[str],
+    summaries: list[str],
+    batch_tokens: int,
+    model: str | None = None,
+) -> list[list[int]]:
+    """Like ``pack_batches``, but only chunks with the same context share a batch."""
+
+    groups: dict[str, list[int]] = {}
+    for idx, summary in enumerate(summaries):
+        groups.setdefault(summary, []).append(idx)
+
+    batches = []
+    for idxs in groups.values():
+        for batch in pack_batches([chunks[i] for i in idxs], batch_tokens, model):
+            batches.append([idxs[i] for i in batch])
+    return batches
+
+
+def group_pending(
+    chunks: list[str],
+    summaries: list[str],
+    source_lang: str,
+    target_lang: str,
+    model: str,
+    translations: list[str],
+    stores: tuple,
+    glossaries: list[str] | None = None,
+) -> dict[str, list[int]]:
+    """Group chunk indices by translation key, minus those already stored.
+
+    Translations found in ``stores`` are filled into ``translations``.
+    """
+
+    # Group identical chunks so each one is translated only once
+    pending: dict[str, list[int]] = {}
+    for idx, chunk in enumerate(chunks):
+        key = translation_key(
+            chunk,
+            summaries[idx],
+            source_lang,
+            target_lang,
+            model,
+            glossaries[idx] if glossaries else "",
+        )
+        pending.setdefault(key, []).append(idx)
+
+    for store in stores:
+        if store is None:
+            continue
+        for key in list(pending):
+            cached = store.get(key)
+            if cached is not None:
+                for idx in pending.pop(key):
+                    translations[idx] = cached
+
+    return pending
+
+
+def finished(future) -> bool:
+    """Whether a future or task completed with a result."""
+
+    return future.done() and not future.cancelled() and future.exception() is None
+
+
+def translate_blocks(
+    chunks: list[str],
+    summary: str | list[str],
+    source_lang: str,
+    target_lang: str,
+    client: BaseClient = None,
+    max_workers: int = 1,
+    batch_tokens: int = 0,
+    cache: TranslationMemory | None = None,
+    checkpoint: Checkpoint | None = None,
+    progress_callback: Callable[[int], None] | None = None,
+    progress_range: Tuple[int, int] = (0, 100),
+    on_token: Callable[[int, str], None] | None = None,
+    max_chunk_tokens: int = 0,
+    terms: TermIndex | None = None,
+) -> list[str]:
+    """Translate chunks concurrently and return the results in input order.
+
+    Identical chunks are translated once, and chunks found in ``checkpoint``
+    or ``cache`` are not sent to the client at all. Every finished
+    translation is written to both as soon as it arrives. Small chunks are
+    packed into batched requests of up to ``batch_tokens`` tokens. The
+    context ``summary`` is either shared by all chunks or given per chunk. With
+    ``on_token`` set, responses are streamed to it along with the index of
+    the first chunk of the request. At most ``max_workers`` requests are in
+    flight at once. Progress is reported from the calling thread as chunks
+    complete, in any order. Chunks over ``max_chunk_tokens`` tokens are
+    split at sentence boundaries and their pieces translated separately.
+    With ``terms`` set, each request lists the glossary entries of the terms
+    occurring in its chunks.
+    """
+
+    translations = [""] * len(chunks)
+    if not chunks or client is None:
+        return translations
+
+    summaries = [summary] * len(chunks) if isinstance(summary, str) else summary
+
+    if max_chunk_tokens:
+        pieces, owners = split_chunks(chunks, max_chunk_tokens, client.model)
+        if len(pieces) > len(chunks):
+            translated = translate_blocks(
+                pieces,
+                [summaries[owner] for owner in owners],
+                source_lang,
+                target_lang,
+                client,
+                max_workers=max_workers,
+                batch_tokens=batch_tokens,
+                cache=cache,
+                checkpoint=checkpoint,
+                progress_callback=progress_callback,
+                progress_range=progress_range,
+                on_token=(
+                    (lambda idx, token: on_token(owners[idx], token))
+                    if on_token
+                    else None
+                ),
+                terms=terms,
+            )
+            return join_pieces(translated, owners, len(chunks))
+
+    total_chunks = len(chunks)
+    start, end = progress_range
+    done = 0
+
+    def report(count: int) -> None:
+        nonlocal done
+        done += count
+        if progress_callback:
+            progress = start + (end - start) * done / total_chunks
+            progress_callback(int(progress))
+
+    # Glossary entries of the terms occurring in each chunk
+    entries = [terms.find(chunk) if terms else {} for chunk in chunks]
+
+    def batch_glossary(batch: list[int]) -> str:
+        found = {}
+        for i in batch:
+            found.update(entries[pending[keys[i]][0]])
+        return format_glossary(found)
+
+    pending = group_pending(
+        chunks,
+        summaries,
+        source_lang,
+        target_lang,
+        client.model,
+        translations,
+        (checkpoint, cache),
+        [format_glossary(found) for found in entries],
+    )
+
+    hits = total_chunks - sum(len(idxs) for idxs in pending.values())
+    if hits:
+        report(hits)
+
+    keys = list(pending)
+    batches = pack_context_batches(
+        [chunks[pending[key][0]] for key in keys],
+        [summaries[pending[key][0]] for key in keys],
+        batch_tokens,
+        client.model,
+    )
+
+    # First key of each batch stored so far
+    stored = set()
+
+    def store(batch_keys: list[str], batch_translations: list[str]) -> None:
+        stored.add(batch_keys[0])
+        for key, translated in zip(batch_keys, batch_translations):
+            for idx in pending[key]:
+                translations[idx] = translated
+            if checkpoint is not None:
+                checkpoint.put(key, translated)
+            if cache is not None:
+                cache.put(key, translated)
+            report(len(pending[key]))
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = {
+            executor.submit(
+                metrics.in_context(translate_batch_with_context),
+                [chunks[pending[keys[i]][0]] for i in batch],
+                summaries[pending[keys[batch[0]]][0]],
+                source_lang,
+                target_lang,
+                client,
+                partial(on_token, pending[keys[batch[0]]][0]) if on_token else None,
+                batch_glossary(batch),
+            ): [keys[i] for i in batch]
+            for batch in batches
+        }
+
+        try:
+            for future in as_completed(futures):
+                store(futures[future], future.result())
+        except BaseException:
+            # Don't keep translating blocks whose results would be dropped,
+            # but keep those already paid for so a resume skips them
+            executor.shutdown(cancel_futures=True)
+            for future in futures:
+                if finished(future) and futures[future][0] not in stored:
+                    store(futures[future], future.result())
+            raise
+
+    return translations
+
+
+async def atranslate_chunk_with_context(
+    chunk: str,
+    summary: str,
+    source_lang: str,
+    target_lang: str,
+    client: BaseClient = None,
+    on_token: Callable[[str], None] | None = None,
+    glossary: str = "",
+) -> str:
+    if client is None:
+        return ""
+    prompt = translate_prompt_with_context(
+        chunk, summary, source_lang, target_lang, glossary
+    )
+    if on_token:
+        return await client.aask_stream(prompt, on_token)
+    resp = await client.aask(prompt)
+    return resp
+
+
+async def atranslate_batch_with_context(
+    chunks: list[str],
+    summary: str,
+    source_lang: str,
+    target_lang: str,
+    client: BaseClient = None,
+    on_token: Callable[[str], None] | None = None,
+    glossary: str = "",
+) -> list[str]:
+    """Async version of ``translate_batch_with_context``."""
+
+    if client is None:
+        return [""] * len(chunks)
+    if len(chunks) == 1:
+        return [
+            await atranslate_chunk_with_context(
+                chunks[0], summary, source_lang, target_lang, client, on_token, glossary
+            )
+        ]
+
+    prompt = translate_prompt_batch(chunks, summary, source_lang, target_lang, glossary)
+    if on_token:
+        resp = await client.aask_stream(prompt, on_token)
+    else:
+        resp = await client.aask(prompt)
+    translations = split_batch_response(resp, len(chunks))
+    if translations is not None:
+        return translations
+
+    return list(
+        await asyncio.gather(
+            *(
+                atranslate_chunk_with_context(
+                    chunk, summary, source_lang, target_lang, client, on_token, glossary
+                )
+                for chunk in chunks
+            )
+        )
+    )
+
+
+async def atranslate_blocks(
+    chunks: list[str],
+    summary: str | list[str],
+    source_lang: str,
+    target_lang: str,
+    client: BaseClient = None,
+    max_concurrency: int = 64,
+    batch_tokens: int = 0,
+    cache: TranslationMemory | None = None,
+    checkpoint: Checkpoint | None = None,
+    progress_callback: Callable[[int], None] | None = None,
+    progress_range: Tuple[int, int] = (0, 100),
+    on_token: Callable[[int, str], None] | None = None,
+    max_chunk_tokens: int = 0,
+    terms: TermIndex | None = None,
+) -> list[str]:
+    """Async version of ``translate_blocks``.
+
+    Requests run as tasks on the current event loop, at most
+    ``max_concurrency`` of them in flight at once.
+    """
+
+    translations = [""] * len(chunks)
+    if not chunks or client is None:
+        return translations
+
+    summaries = [summary] * len(chunks) if isinstance(summary, str) else summary
+
+    if max_chunk_tokens:
+        pieces, owners = split_chunks(chunks, max_chunk_tokens, client.model)
+        if len(pieces) > len(chunks):
+            translated = await atranslate_blocks(
+                pieces,
+                [summaries[owner] for owner in owners],
+                source_lang,
+                target_lang,
+                client,
+                max_concurrency=max_concurrency,
+                batch_tokens=batch_tokens,
+                cache=cache,
+                checkpoint=checkpoint,
+                progress_callback=progress_callback,
+                progress_range=progress_range,
+                on_token=(
+                    (lambda idx, token: on_token(owners[idx], token))
+                    if on_token
+                    else None
+                ),
+                terms=terms,
+            )
+            return join_pieces(translated, owners, len(chunks))
+
+    total_chunks = len(chunks)
+    start, end = progress_range
+    done = 0
+
+    def report(count: int) -> None:
+        nonlocal done
+        done += count
+        if progress_callback:
+            progress = start + (end - start) * done / total_chunks
+            progress_callback(int(progress))
+
+    # Glossary entries of the terms occurring in each chunk
+    entries = [terms.find(chunk) if terms else {} for chunk in chunks]
+
+    def batch_glossary(batch: list[int]) -> str:
+        found = {}
+        for i in batch:
+            found.update(entries[pending[keys[i]][0]])
+        return format_glossary(found)
+
+    # SQLite calls block, keep them off the event loop
+    pending = await asyncio.to_thread(
+        group_pending,
+        chunks,
+        summaries,
+        source_lang,
+        target_lang,
+        client.model,
+        translations,
+        (checkpoint, cache),
+        [format_glossary(found) for found in entries],
+    )
+
+    hits = total_chunks - sum(len(idxs) for idxs in pending.values())
+    if hits:
+        report(hits)
+
+    keys = list(pending)
+    batches = pack_context_batches(
+        [chunks[pending[key][0]] for key in keys],
+        [summaries[pending[key][0]] for key in keys],
+        batch_tokens,
+        client.model,
+    )
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def run(batch: list[int]) -> tuple[list[str], list[str]]:
+        async with semaphore:
+            translated = await atranslate_batch_with_context(
+                [chunks[pending[keys[i]][0]] for i in batch],
+                summaries[pending[keys[batch[0]]][0]],
+                source_lang,
+                target_lang,
+                client,
+                partial(on_token, pending[keys[batch[0]]][0]) if on_token else None,
+                batch_glossary(batch),
+            )
+        return [keys[i] for i in batch], translated
+
+    # First key of each batch stored so far
+    stored = set()
+
+    def persist(batch_keys: list[str], batch_translations: list[str]) -> None:
+        for key, translated in zip(batch_keys, batch_translations):
+            if checkpoint is not None:
+                checkpoint.put(key, translated)
+            if cache is not None:
+                cache.put(key, translated)
+
+    async def store(batch_keys: list[str], batch_translations: list[str]) -> None:
+        stored.add(batch_keys[0])
+        if checkpoint is not None or cache is not None:
+            await asyncio.to_thread(persist, batch_keys, batch_translations)
+        for key, translated in zip(batch_keys, batch_translations):
+            for idx in pending[key]:
+                translations[idx] = translated
+            report(len(pending[key]))
+
+    tasks = [asyncio.ensure_future(run(batch)) for batch in batches]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            await store(*await next_done)
+    except BaseException:
+        # Don't keep translating blocks whose results would be dropped,
+        # but keep those already paid for so a resume skips them
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            if finished(task) and task.result()[0][0] not in stored:
+                await store(*task.result())
+        raise
+
+    return translations
+
+
+def skip_blocks(
+    blocks: list[Block], src_lang: str, tgt_lang: str, config: dict
+) -> tuple[list[Block], int]:
+    """Drop blocks needing no translation unless ``skip_untranslatable`` is off.
+
+    Returns the blocks to translate and the number of blocks skipped.
+    """
+
+    keep, skipped = blocks, {}
+    if config_flag(config.get("skip_untranslatable", True)):
+        keep, skipped = filter_blocks(blocks, tgt_lang, src_lang)
+
+    metrics.count("blocks_total", len(keep), outcome="translated")
+    for reason, count in skipped.items():
+        metrics.count("blocks_total", count, outcome="skipped", reason=reason)
+    return keep, sum(skipped.values())
+
+
+def job_glossary(
+    index: list[Block],
+    config: dict,
+    source_lang: str,
+    target_lang: str,
+    model: str,
+) -> tuple[dict[str, str], list[str], str]:
+    """The user glossary of a job, plus extracted terms it lacks.
+
+    Returns the glossary read from ``glossary_path``, the candidate terms of
+    the document still to translate when ``extract_terms`` is on, and the key
+    their translations are stored under.
+    """
+
+    glossary = {}
+    if config.get("glossary_path"):
+        glossary = load_glossary(config["glossary_path"])
+
+    terms = []
+    if config_flag(config.get("extract_terms", True)):
+        known = {term.lower() for term in glossary}
+        terms = [
+            term
+            for term in extract_terms(
+                [block.text for block in index],
+                max_terms=int(config.get("max_terms", 100)),
+                min_count=int(config.get("min_term_count", 3)),
+            )
+            if term.lower() not in known
+        ]
+
+    key = content_hash("terms", *terms, source_lang, target_lang, model, PROMPT_VERSION)
+    return glossary, terms, key
+
+
+def stored_terms(key: str, stores: tuple) -> dict[str, str] | None:
+    for store in stores:
+        if store is not None:
+            entries = store.get(key)
+            if entries is not None:
+                return json.loads(entries)
+    return None
+
+
+def store_terms(key: str, entries: dict[str, str], stores: tuple) -> None:
+    for store in stores:
+        if store is not None:
+            store.put(key, json.dumps(entries, ensure_ascii=False))
+
+
+def build_glossary(
+    index: list[Block],
+    client: BaseClient,
+    config: dict,
+    source_lang: str,
+    target_lang: str,
+    summary_cache: SummaryCache | None = None,
+    checkpoint: Checkpoint | None = None,
+) -> TermIndex | None:
+    """Index the glossary of a job, see ``job_glossary``.
+
+    Extracted terms are translated in one request per document, and their
+    translations kept in ``checkpoint`` and ``summary_cache``. Entries of
+    the user glossary win over extracted ones.
+    """
+
+    with metrics.span("glossary") as attrs:
+        glossary, terms, key = job_glossary(
+            index, config, source_lang, target_lang, client.model
+        )
+        if terms:
+            stores = (checkpoint, summary_cache)
+            extracted = stored_terms(key, stores)
+            if extracted is None:
+                resp = client.ask(glossary_prompt(terms, source_lang, target_lang))
+                extracted = parse_glossary(resp, terms)
+                store_terms(key, extracted, stores)
+            glossary = extracted | glossary
+        attrs["terms"] = len(glossary)
+
+    return TermIndex(glossary) if glossary else None
+
+
+async def abuild_glossary(
+    index: list[Block],
+    client: BaseClient,
+    config: dict,
+    source_lang: str,
+    target_lang: str,
+    summary_cache: SummaryCache | None = None,
+    checkpoint: Checkpoint | None = None,
+) -> TermIndex | None:
+    """Async version of ``build_glossary``."""
+
+    with metrics.span("glossary") as attrs:
+        glossary, terms, key = job_glossary(
+            index, config, source_lang, target_lang, client.model
+        )
+        if terms:
+            stores = (checkpoint, summary_cache)
+            extracted = await asyncio.to_thread(stored_terms, key, stores)
+            if extracted is None:
+                resp = await client.aask(
+                    glossary_prompt(terms, source_lang, target_lang)
+                )
+                extracted = parse_glossary(resp, terms)
+                await asyncio.to_thread(store_terms, key, extracted, stores)
+            glossary = extracted | glossary
+        attrs["terms"] = len(glossary)
+
+    return TermIndex(glossary) if glossary else None
+
+
+def section_key(section: int, section_pages: int) -> str:
+    """Checkpoint key of the summary of a section, see ``core.context``."""
+
+    if not section_pages:
+        return SUMMARY_KEY
+    return f"{SUMMARY_KEY}:{section_pages}:{section}"
+
+
+def resume_sections(
+    sections: dict[int, list[Block]],
+    section_pages: int,
+    checkpoint: Checkpoint | None = None,
+) -> tuple[dict[int, str], dict[int, list[Block]]]:
+    """Split sections into summaries found in ``checkpoint`` and those missing."""
+
+    summaries = {}
+    missing = {}
+    for section, blocks in sections.items():
+        summary = None
+        if checkpoint is not None:
+            summary = checkpoint.get(section_key(section, section_pages))
+        if summary is None:
+            missing[section] = blocks
+        else:
+            summaries[section] = summary
+    return summaries, missing
+
+
+def store_sections(
+    summaries: dict[int, str], section_pages: int, checkpoint: Checkpoint
+) -> None:
+    for section, summary in summaries.items():
+        checkpoint.put(section_key(section, section_pages), summary)
+
+
+def summarize_job(
+    index: list[Block],
+    client: BaseClient,
+    config: dict,
+    summary_cache: SummaryCache | None = None,
+    checkpoint: Checkpoint | None = None,
+    progress_callback: Callable[[int], None] | None = None,
+) -> dict[int, str]:
+    """Summarize the block index of a job, resuming from ``checkpoint``.
+
+    Returns the translation context of each section, as set by
+    ``context_strategy``; see ``core.context``.
+    """
+
+    _, max_tokens, section_pages = context_settings(config)
+    summaries, missing = resume_sections(
+        group_sections(index, section_pages), section_pages, checkpoint
+    )
+
+    if missing:
+        with metrics.span("summarize", sections=len(missing)):
+            summarized = summarize_sections(
+                missing,
+                client,
+                progress_callback=progress_callback,
+                progress_range=(0, 20),
+                max_workers=int(config.get("max_concurrency", 4)),
+                chunk_tokens=int(config.get("summary_chunk_tokens", 2500)),
+                cache=summary_cache,
+            )
+        if checkpoint is not None:
+            store_sections(summarized, section_pages, checkpoint)
+        summaries |= summarized
+    elif progress_callback:
+        progress_callback(20)
+
+    return {
+        section: cap_summary(summary, max_tokens, client.model)
+        for section, summary in summaries.items()
+    }
+
+
+async def asummarize_job(
+    index: list[Block],
+    client: BaseClient,
+    config: dict,
+    summary_cache: SummaryCache | None = None,
+    checkpoint: Checkpoint | None = None,
+    progress_callback: Callable[[int], None] | None = None,
+) -> dict[int, str]:
+    """Async version of ``summarize_job``."""
+
+    _, max_tokens, section_pages = context_settings(config)
+    summaries, missing = await asyncio.to_thread(
+        resume_sections, group_sections(index, section_pages), section_pages, checkpoint
+    )
+
+    if missing:
+        with metrics.span("summarize", sections=len(missing)):
+            summarized = await asummarize_sections(
+                missing,
+                client,
+                progress_callback=progress_callback,
+                progress_range=(0, 20),
+                max_concurrency=int(config.get("async_concurrency", 64)),
+                chunk_tokens=int(config.get("summary_chunk_tokens", 2500)),
+                cache=summary_cache,
+            )
+        if checkpoint is not None:
+            await asyncio.to_thread(
+                store_sections, summarized, section_pages, checkpoint
+            )
+        summaries |= summarized
+    elif progress_callback:
+        progress_callback(20)
+
+    return {
+        section: cap_summary(summary, max_tokens, client.model)
+        for section, summary in summaries.items()
+    }
+
+
+def page_windows(
+    first: int,
+    last: int,
+    size: int,
+    priority: int | None = None,
+    priority_size: int = 0,
+) -> list[tuple[int, int]]:
+    """Windows of up to ``size`` pages of ``first``..``last``, in translation order.
+
+    Pages are 0-indexed and ranges inclusive. Windows start at page
+    ``priority``, the first page if None, and wrap around to the pages
+    before it. The first window holds ``priority_size`` pages when set, so
+    the pages wanted first are ready sooner.
+    """
+
+    start = first if priority is None else min(max(priority, first), last)
+    windows = []
+    for lo, hi in ((start, last), (first, start - 1)):
+        pno = lo
+        while pno <= hi:
+            count = priority_size if priority_size and not windows else size
+            windows.append((pno, min(pno + count, hi + 1) - 1))
+            pno += count
+    return windows
+
+
+def record_first_page(started: float) -> float:
+    """Seconds from ``started`` until the first translated page was written.
+
+    Recorded in ``first_page_seconds`` and as a span of the current trace.
+    """
+
+    seconds = time.perf_counter() - started
+    metrics.observe("first_page_seconds", seconds)
+    trace = metrics.current_trace()
+    if trace is not None:
+        trace.add_span("first_page", started, seconds)
+    return seconds
+
+
+def close_job(
+    doc: pymupdf.Document | None,
+    cache: TranslationMemory | None,
+    summary_cache: SummaryCache | None,
+    checkpoint: Checkpoint | None,
+    done: bool,
+) -> None:
+    """Close what a job opened, whether it finished or failed.
+
+    The checkpoint of a finished job is removed. The checkpoint of a failed
+    job is closed and kept, so that a rerun in this process opens it again
+    and resumes.
+    """
+
+    if doc is not None:
+        with PDF_LOCK:
+            doc.close()
+    if cache is not None:
+        cache.close()
+    if summary_cache is not None:
+        summary_cache.close()
+    if checkpoint is not None:
+        if done:
+            checkpoint.remove()
+        else:
+            checkpoint.close()
+
+
+def block_index(
+    doc: pymupdf.Document,
+    pages: range,
+    workers: int,
+    index: list[Block] | None = None,
+) -> list[Block]:
+    """Blocks of ``pages``, taken from ``index`` when given or extracted from ``doc``."""
+
+    if index is None:
+        return build_block_index(doc, pages, workers)
+    return [block for block in index if block.page in pages]
+
+
+class LayoutJob:
+    """Setup shared by the layout preserving pipelines.
+
+    Holds the clients, caches, checkpoint and document of a job, and the
+    blocks to translate with their context and glossary. Used as a context
+    manager, which closes what the job opened on exit, see ``close_job``;
+    the job counts as done when no exception was raised. Caches passed in
+    are shared with the caller and left open.
+    """
+
+    def __init__(
+        self,
+        pdf_file: IO[bytes],
+        config: dict,
+        src_lang: str,
+        tgt_lang: str,
+        start_page: int,
+        end_page: int,
+        cache: TranslationMemory | None = None,
+        summary_cache: SummaryCache | None = None,
+    ):
+        self.pdf_file = pdf_file
+        self.config = config
+        self.src_lang = src_lang
+        self.tgt_lang = tgt_lang
+        self.start_page = start_page
+        self.end_page = end_page
+        self.client = create_client(config, tier="translate")
+        self.summary_client = create_client(config, tier="summarize")
+        self.workers = pdf_workers(config)
+        _, _, self.section_pages = context_settings(config)
+
+        self.owned_cache = cache is None
+        self.owned_summary_cache = summary_cache is None
+        self.cache = cache
+        self.summary_cache = summary_cache
+        self.checkpoint: Checkpoint | None = None
+        self.doc: pymupdf.Document | None = None
+        self.index: list[Block] | None = None
+        self.blocks: list[Block] = []
+        self.skipped = 0
+        self.contexts: dict[int, str] = {}
+        self.terms: TermIndex | None = None
+
+    def open(self, index: list[Block] | None = None) -> None:
+        """Open the caches, checkpoint and document, and index its blocks.
+
+        The index covers the selected pages plus the summary window, taken
+        from ``index`` when given. This blocks, so the async pipeline runs
+        it on a worker thread.
+        """
+
+        if self.owned_cache:
+            self.cache = open_translation_memory(self.config)
+        if self.owned_summary_cache:
+            self.summary_cache = open_summary_cache(self.config)
+
+        self.checkpoint = open_checkpoint(
+            self.config,
+            self.pdf_file,
+            self.src_lang,
+            self.tgt_lang,
+            self.start_page,
+            self.end_page,
+            f"{self.summary_client.model}/{self.client.model}",
+        )
+
+        with PDF_LOCK:
+            self.doc = open_document(self.pdf_file)
+
+            window = int(self.config.get("summary_window", 0))
+            first = max(1, self.start_page - window)
+            last = min(self.doc.page_count, self.end_page + window)
+            self.index = block_index(
+                self.doc, range(first - 1, last), self.workers, index
+            )
+
+    def _select(self, contexts: dict[int, str], terms: TermIndex | None) -> None:
+        self.contexts = contexts
+        self.terms = terms
+        blocks = [
+            block
+            for block in self.index
+            if self.start_page - 1 <= block.page < self.end_page
+        ]
+        self.blocks, self.skipped = skip_blocks(
+            blocks, self.src_lang, self.tgt_lang, self.config
+        )
+        # Only the blocks to translate are needed from here on
+        self.index = None
+
+    def prepare(self, progress_callback: Callable[[int], None] | None = None) -> None:
+        """Summarize the index, build the glossary and select the blocks."""
+
+        contexts = summarize_job(
+            self.index,
+            self.summary_client,
+            self.config,
+            self.summary_cache,
+            self.checkpoint,
+            progress_callback,
+        )
+        terms = build_glossary(
+            self.index,
+            self.client,
+            self.config,
+            self.src_lang,
+            self.tgt_lang,
+            self.summary_cache,
+            self.checkpoint,
+        )
+        self._select(contexts, terms)
+
+    async def aprepare(
+        self, progress_callback: Callable[[int], None] | None = None
+    ) -> None:
+        """Async version of ``prepare``."""
+
+        contexts = await asummarize_job(
+            self.index,
+            self.summary_client,
+            self.config,
+            self.summary_cache,
+            self.checkpoint,
+            progress_callback,
+        )
+        terms = await abuild_glossary(
+            self.index,
+            self.client,
+            self.config,
+            self.src_lang,
+            self.tgt_lang,
+            self.summary_cache,
+            self.checkpoint,
+        )
+        self._select(contexts, terms)
+
+    def translate(
+        self,
+        blocks: list[Block],
+        progress_callback: Callable[[int], None] | None = None,
+        progress_range: Tuple[int, int] = (20, 100),
+        on_token: Callable[[int, str], None] | None = None,
+    ) -> list[str]:
+        """Translations of ``blocks``, see ``translate_blocks``."""
+
+        with metrics.span("translate", blocks=len(blocks)):
+            return translate_blocks(
+                [block.text for block in blocks],
+                block_contexts(blocks, self.contexts, self.section_pages),
+                self.src_lang,
+                self.tgt_lang,
+                self.client,
+                max_workers=int(self.config.get("max_concurrency", 4)),
+                batch_tokens=int(self.config.get("batch_tokens", 0)),
+                max_chunk_tokens=int(self.config.get("max_chunk_tokens", 1000)),
+                terms=self.terms,
+                cache=self.cache,
+                checkpoint=self.checkpoint,
+                progress_callback=progress_callback,
+                progress_range=progress_range,
+                on_token=on_token,
+            )
+
+    async def atranslate(
+        self,
+        blocks: list[Block],
+        progress_callback: Callable[[int], None] | None = None,
+        progress_range: Tuple[int, int] = (20, 100),
+        on_token: Callable[[int, str], None] | None = None,
+    ) -> list[str]:
+        """Async version of ``translate``."""
+
+        with metrics.span("translate", blocks=len(blocks)):
+            return await atranslate_blocks(
+                [block.text for block in blocks],
+                block_contexts(blocks, self.contexts, self.section_pages),
+                self.src_lang,
+                self.tgt_lang,
+                self.client,
+                max_concurrency=int(self.config.get("async_concurrency", 64)),
+                batch_tokens=int(self.config.get("batch_tokens", 0)),
+                max_chunk_tokens=int(self.config.get("max_chunk_tokens", 1000)),
+                terms=self.terms,
+                cache=self.cache,
+                checkpoint=self.checkpoint,
+                progress_callback=progress_callback,
+                progress_range=progress_range,
+                on_token=on_token,
+            )
+
+    def preview(
+        self,
+        blocks: list[Block],
+        preview_callback: Callable[[int, int, str], None] | None,
+        offset: int = 0,
+    ) -> Callable[[int, str], None] | None:
+        """``on_token`` passing tokens of ``blocks`` to ``preview_callback``.
+
+        Block indices are counted from ``offset`` in ``self.blocks``.
+        """
+
+        if preview_callback is None:
+            return None
+
+        def on_token(idx: int, token: str) -> None:
+            preview_callback(blocks[idx].page + 1, offset + idx, token)
+
+        return on_token
+
+    def stats(self, render_times: list[float], first_page_seconds: float) -> dict:
+        return {
+            "pages": self.end_page - self.start_page + 1,
+            "blocks": len(self.blocks),
+            "skipped": self.skipped,
+            "render_seconds_per_page": sum(render_times) / max(len(render_times), 1),
+            "first_page_seconds": first_page_seconds,
+            **self.client.latency.summary(),
+        }
+
+    def close(self, done: bool) -> None:
+        close_job(
+            self.doc,
+            self.cache if self.owned_cache else None,
+            self.summary_cache if self.owned_summary_cache else None,
+            self.checkpoint,
+            done,
+        )
+        self.doc = None
+        self.checkpoint = None
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close(exc_type is None)
+
+    async def __aenter__(self) -> Self:
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await asyncio.to_thread(self.close, exc_type is None)
+
+
 def translate_pdf(
     pdf_file: IO[bytes],
     config: dict,
@@ -43,23 +1178,43 @@ def translate_pdf(
 ) -> str:
     """Summarizes the document, then translates each chunk of text"""
 
-    # Initialize client
-    client = OllamaClient(
-        model=config["model"],
-        base_url=config["base_url"],
-    )
+    # Initialize clients
+    client = create_client(config, tier="translate")
+    summary_client = create_client(config, tier="summarize")
 
     # Summarize the document
-    summary = summarize_doc(pdf_file, client)
+    summary_cache = open_summary_cache(config)
+    summary = summarize_doc(
+        pdf_file,
+        summary_client,
+        start_page=start_page,
+        end_page=end_page,
+        window=int(config.get("summary_window", 0)),
+        max_workers=int(config.get("max_concurrency", 4)),
+        chunk_tokens=int(config.get("summary_chunk_tokens", 2500)),
+        cache=summary_cache,
+        pdf_workers=pdf_workers(config),
+    )
+    if summary_cache is not None:
+        summary_cache.close()
+    pdf_file.seek(0)
+
+    _, max_tokens, _ = context_settings(config)
+    context = cap_summary(summary, max_tokens, summary_client.model)
 
     # Extract text chunks
-    docs = extract_text(pdf_file, chunk_size=3000)
+    docs = extract_text(
+        pdf_file,
+        chunk_tokens=int(config.get("max_chunk_tokens", 1000)),
+        model=client.model,
+        workers=pdf_workers(config),
+    )
 
     # Translate each chunk of text
     translated_chunks = []
     for i, doc in enumerate(docs):
         translated_chunk = translate_chunk_with_context(
-            doc, summary, src_lang, tgt_lang, client
+            doc.page_content, context, src_lang, tgt_lang, client
         )
         translated_chunks.append(translated_chunk)
 
@@ -83,95 +1238,296 @@ def translate_pdf_preserve_layout(
     start_page: int,
     end_page: int,
     progress_callback: Callable[[int], None] | None = None,
-) -> None:
+    cache: TranslationMemory | None = None,
+    summary_cache: SummaryCache | None = None,
+    preview_callback: Callable[[int, int, str], None] | None = None,
+    index: list[Block] | None = None,
+    priority_page: int | None = None,
+    page_callback: Callable[[int, pymupdf.Page], None] | None = None,
+) -> dict:
     """Translate a PDF and write a new PDF preserving the original layout.
 
     Only pages within ``start_page`` and ``end_page`` (1-indexed, inclusive)
-    are processed and included in the output document.
+    are processed and included in the output document. With ``streaming``
+    set in the config, pages go through ``translate_pdf_streaming``.
+    Caches passed in are shared with the caller and left open; otherwise
+    they are opened from the config for this job. With ``preview_callback``
+    set, translations are streamed to it token by token along with their
+    page number and the index of the first block of the request. Blocks
+    needing no translation, such as page numbers, URLs or equations, are
+    left as they are. ``index`` holds the blocks of the document when
+    already extracted, which are then not extracted again. ``priority_page``
+    and ``page_callback`` apply to the streaming pipeline only. Returns the
+    number of pages and blocks translated, the number of blocks skipped, the
+    seconds until the first translated page was written and the latency of
+    streamed requests.
     """
 
-    client = OllamaClient(model=config["model"], base_url=config["base_url"])
+    if config_flag(config.get("streaming", False)):
+        return translate_pdf_streaming(
+            pdf_file,
+            output_path,
+            config,
+            src_lang,
+            tgt_lang,
+            start_page,
+            end_page,
+            progress_callback=progress_callback,
+            cache=cache,
+            summary_cache=summary_cache,
+            preview_callback=preview_callback,
+            index=index,
+            priority_page=priority_page,
+            page_callback=page_callback,
+        )
 
-    # client = OpenAIClient(
-    #     api_key=os.environ["OPENROUTER_API_KEY"],
-    #     model=config["model"],
-    #     base_url=config["base_url"],
-    # )
+    started = time.perf_counter()
+    job = LayoutJob(
+        pdf_file, config, src_lang, tgt_lang, start_page, end_page, cache, summary_cache
+    )
+    with job:
+        job.open(index)
+        # Summarize the document to provide translation context
+        job.prepare(progress_callback)
 
-    # Summarize the document to provide translation context
-    summary = summarize_doc(
-        pdf_file, client, progress_callback=progress_callback, progress_range=(0, 20)
+        # Translate all blocks concurrently, results come back in block order
+        blocks = job.blocks
+        translated = job.translate(
+            blocks,
+            progress_callback,
+            on_token=job.preview(blocks, preview_callback),
+        )
+
+        with PDF_LOCK:
+            render_times = render_document(
+                job.doc,
+                output_path,
+                blocks,
+                translated,
+                range(start_page - 1, end_page),
+                job.workers,
+            )
+        first_page_seconds = record_first_page(started)
+
+    if progress_callback:
+        progress_callback(100)
+
+    return job.stats(render_times, first_page_seconds)
+
+
+def translate_pdf_streaming(
+    pdf_file: IO[bytes],
+    output_path: str,
+    config: dict,
+    src_lang: str,
+    tgt_lang: str,
+    start_page: int,
+    end_page: int,
+    progress_callback: Callable[[int], None] | None = None,
+    cache: TranslationMemory | None = None,
+    summary_cache: SummaryCache | None = None,
+    preview_callback: Callable[[int, int, str], None] | None = None,
+    index: list[Block] | None = None,
+    priority_page: int | None = None,
+    page_callback: Callable[[int, pymupdf.Page], None] | None = None,
+) -> dict:
+    """Translate a PDF window by window, adding finished pages to the output.
+
+    Pages are translated ``stream_window_pages`` at a time. Translated windows
+    are handed to a render thread through a queue of ``stream_queue_size``
+    entries, which copies the window into its own document, renders it and
+    inserts it into ``output_path`` with an incremental save. Rendering of one
+    window thus overlaps translation of the next, and only a few windows are
+    held in memory at once. While the pipeline runs all PyMuPDF work of the
+    job happens on the render thread.
+
+    Windows are translated from ``priority_page`` (1-indexed, ``start_page``
+    if None) on, then the pages before it, with a first window of
+    ``priority_pages`` pages when set. Each window is inserted at its place,
+    so ``output_path`` holds the pages finished so far in page order.
+    ``page_callback`` gets the page number and rendered page of each page
+    once it is written, on the render thread while holding ``PDF_LOCK``.
+    """
+
+    started = time.perf_counter()
+    job = LayoutJob(
+        pdf_file, config, src_lang, tgt_lang, start_page, end_page, cache, summary_cache
     )
+    with job:
+        job.open(index)
+        job.prepare(progress_callback)
+        blocks = job.blocks
+        doc = job.doc
 
-    # Reset the file pointer after reading during summarization
-    pdf_file.seek(0)
+        window_pages = max(1, int(config.get("stream_window_pages", 8)))
+        windows: queue.Queue = queue.Queue(
+            maxsize=max(1, int(config.get("stream_queue_size", 2)))
+        )
+        errors: list[BaseException] = []
+        render_times: list[float] = []
+        first_page_seconds: list[float] = []
+
+        def render_worker() -> None:
+            # Source pages already in the output, in order
+            written: list[int] = []
+            try:
+                while (item := windows.get()) is not None:
+                    first_pno, last_pno, window_blocks, translated = item
+                    with PDF_LOCK:
+                        part = pymupdf.open()
+                        part.insert_pdf(doc, from_page=first_pno, to_page=last_pno)
+                        render_times.extend(
+                            render_blocks(
+                                part, window_blocks, translated, first_page=first_pno
+                            )
+                        )
+                        with metrics.span("save"):
+                            start_at = bisect.bisect_left(written, first_pno)
+                            append_pages(part, output_path, not written, start_at)
+                        if not written:
+                            first_page_seconds.append(record_first_page(started))
+                        written[start_at:start_at] = range(first_pno, last_pno + 1)
+                        if page_callback:
+                            for pno, page in zip(range(first_pno, last_pno + 1), part):
+                                page_callback(pno + 1, page)
+                        part.close()
+            except BaseException as e:
+                errors.append(e)
+                # Keep draining so the translating thread never blocks
+                while windows.get() is not None:
+                    pass
+
+        renderer = threading.Thread(
+            target=metrics.in_context(render_worker), daemon=True
+        )
+        renderer.start()
+
+        order = page_windows(
+            start_page - 1,
+            end_page - 1,
+            window_pages,
+            None if priority_page is None else priority_page - 1,
+            int(config.get("priority_pages", 0)),
+        )
+
+        total_blocks = len(blocks)
+        done_blocks = 0
+        try:
+            for first_pno, last_pno in order:
+                if errors:
+                    break
+                # Blocks are in page order, the window's start at ``offset``
+                offset = bisect.bisect_left(
+                    blocks, first_pno, key=lambda block: block.page
+                )
+                end = bisect.bisect_right(
+                    blocks, last_pno, key=lambda block: block.page
+                )
+                window_blocks = blocks[offset:end]
+
+                progress_range = (20, 100)
+                if total_blocks:
+                    progress_range = (
+                        20 + 80 * done_blocks / total_blocks,
+                        20 + 80 * (done_blocks + len(window_blocks)) / total_blocks,
+                    )
+
+                translated = job.translate(
+                    window_blocks,
+                    progress_callback,
+                    progress_range,
+                    job.preview(window_blocks, preview_callback, offset),
+                )
+                done_blocks += len(window_blocks)
+
+                windows.put((first_pno, last_pno, window_blocks, translated))
+        finally:
+            windows.put(None)
+            renderer.join()
+
+        if errors:
+            raise errors[0]
 
-    doc = pymupdf.open(stream=pdf_file.read(), filetype="pdf")
-    doc.select(list(range(start_page - 1, end_page)))
+    if progress_callback:
+        progress_callback(100)
+
+    return job.stats(render_times, first_page_seconds[0] if first_page_seconds else 0.0)
+
+
+async def atranslate_pdf_preserve_layout(
+    pdf_file: IO[bytes],
+    output_path: str,
+    config: dict,
+    src_lang: str,
+    tgt_lang: str,
+    start_page: int,
+    end_page: int,
+    progress_callback: Callable[[int], None] | None = None,
+    cache: TranslationMemory | None = None,
+    summary_cache: SummaryCache | None = None,
+    preview_callback: Callable[[int, int, str], None] | None = None,
+    index: list[Block] | None = None,
+    priority_page: int | None = None,
+    page_callback: Callable[[int, pymupdf.Page], None] | None = None,
+) -> dict:
+    """Async version of ``translate_pdf_preserve_layout``.
+
+    LLM requests run on the current event loop, up to ``async_concurrency``
+    at once, so many documents can be translated from one loop. PyMuPDF
+    work runs on a worker thread to keep the loop responsive. With
+    ``streaming`` set, the job runs ``translate_pdf_streaming`` on a worker
+    thread instead.
+    """
 
-    rtl = True
+    if config_flag(config.get("streaming", False)):
+        return await asyncio.to_thread(
+            translate_pdf_streaming,
+            pdf_file,
+            output_path,
+            config,
+            src_lang,
+            tgt_lang,
+            start_page,
+            end_page,
+            progress_callback=progress_callback,
+            cache=cache,
+            summary_cache=summary_cache,
+            preview_callback=preview_callback,
+            index=index,
+            priority_page=priority_page,
+            page_callback=page_callback,
+        )
 
-    font_file1 = "fonts/Yekan.ttf"
-    css1 = (
-        """@font-face {font-family: sans-serif; src: url("%s");}
-    body {font-family:sans-serif;} """
-        % font_file1
+    started = time.perf_counter()
+    job = LayoutJob(
+        pdf_file, config, src_lang, tgt_lang, start_page, end_page, cache, summary_cache
     )
+    async with job:
+        await asyncio.to_thread(job.open, index)
+        await job.aprepare(progress_callback)
 
-    # Count total blocks to translate
-    total_blocks = 0
-    for i in range(doc.page_count):
-        page = doc[i]
-        blocks = page.get_text("blocks")
-        for block in blocks:
-            text = block[4]
-            if text.strip():
-                total_blocks += 1
-
-    processed_blocks = 0
-
-    for i in range(doc.page_count):
-        page = doc[i]
-        blocks = page.get_text("blocks")
-        rects = []
-        translations = []
-
-        for block in blocks:
-            x0, y0, x1, y1, text = block[:5]
-            if not text.strip():
-                continue
-
-            translated = translate_chunk_with_context(
-                text, summary, src_lang, tgt_lang, client
-            )
+        blocks = job.blocks
+        translated = await job.atranslate(
+            blocks,
+            progress_callback,
+            on_token=job.preview(blocks, preview_callback),
+        )
 
-            rect = pymupdf.Rect(x0, y0, x1, y1)
-            rects.append(rect)
-            translations.append(translated)
-            page.add_redact_annot(rect, fill=(1, 1, 1))
-
-            processed_blocks += 1
-            if progress_callback and total_blocks:
-                progress = 20 + 80 * processed_blocks / total_blocks
-                progress_callback(int(progress))
-
-        # Remove only the original text
-        page.apply_redactions(images=0, graphics=0, text=0)
-
-        align = 2 if rtl else 0
-        for rect, text in zip(rects, translations):
-            fontsize = rect.y1 - rect.y0 - 1
-            text = f"""
-            <div dir="rtl">{text}</div>
-            """
-            page.insert_htmlbox(rect, text, css=css1)
-            # while fontsize > 5:
-            #     area = page.insert_textbox(rect, text, fontsize=fontsize, fontname="F0")
-            #     if area >= 0:
-            #         break
-            #     fontsize -= 1
-
-    doc.save(output_path)
+        def render() -> list[float]:
+            with PDF_LOCK:
+                return render_document(
+                    job.doc,
+                    output_path,
+                    blocks,
+                    translated,
+                    range(start_page - 1, end_page),
+                    job.workers,
+                )
+
+        render_times = await asyncio.to_thread(render)
+        first_page_seconds = record_first_page(started)
 
     if progress_callback:
         progress_callback(100)
+
+    return job.stats(render_times, first_page_seconds)
@@ -1,38 +1,20 @@
-import os
-import tempfile
+import re
+import time
+from dataclasses import dataclass
 from pathlib import Path
 from typing import IO
 
+import pymupdf
 import streamlit as st
-import yaml
-from dotenv import load_dotenv
 
-from core.extract import get_page_count
-from core.translate import translate_pdf_preserve_layout
+from core.config import load_config
+from core.extract import PDF_LOCK, Block, build_block_index
+from core.jobs import Job, JobManager
+from core.metrics import serve_metrics
+from core.shard import pdf_workers
+from core.translate import config_flag
 from styles import apply_custom_styles
 
-CONFIG_FILE = Path("config.yaml")
-ENV_FILE = Path(".env")
-
-
-def load_config():
-    # Load environment variables from .env into os.environ
-    if ENV_FILE.exists():
-        load_dotenv(ENV_FILE)
-
-    # Start with config from YAML
-    config = {}
-    if CONFIG_FILE.exists():
-        with open(CONFIG_FILE, "r") as f:
-            config = yaml.safe_load(f) or {}
-
-    # Merge in all environment variables
-    for key, value in os.environ.items():
-        config[key.lower()] = value
-
-    return config
-
-
 # Page configuration
 st.set_page_config(
     page_title="PDF Translator",
@@ -74,6 +56,7 @@ def validate_inputs(
     start_page: int,
     end_page: int,
     page_count: int,
+    priority_page: int | None = None,
 ):
     """Validate all inputs and return list of errors."""
     errors = []
@@ -86,22 +69,81 @@ def validate_inputs(
         errors.append("❌ End page must be greater than or equal to start page.")
     if page_count and (start_page < 1 or end_page > page_count):
         errors.append("❌ Selected page range is out of bounds.")
+    if priority_page is not None and not start_page <= priority_page <= end_page:
+        errors.append("❌ The page to start with must be within the selected range.")
 
     return errors
 
 
-def show_translation_summary(pdf_file, start_page, end_page, src_lang, tgt_lang):
+@st.cache_resource
+def get_job_manager() -> JobManager:
+    """One worker pool shared by every session of the app."""
+    config = load_config()
+    if int(config.get("metrics_port", 0)):
+        serve_metrics(int(config["metrics_port"]))
+    return JobManager(config)
+
+
+@dataclass
+class ParsedDocument:
+    """Page count and text blocks of an uploaded PDF."""
+
+    page_count: int
+    blocks: list[Block]
+
+
+def spool_upload(uploaded_pdf) -> Path:
+    """Path of the upload on disk, written once per uploaded file.
+
+    Reruns of the script get the same path back without copying the file.
+    """
+    spooled = st.session_state.get("upload")
+    if spooled and spooled[0] == uploaded_pdf.file_id and spooled[1].exists():
+        return spooled[1]
+
+    path = get_job_manager().spool(uploaded_pdf)
+    st.session_state["upload"] = (uploaded_pdf.file_id, path)
+    return path
+
+
+@st.cache_resource(max_entries=8, ttl=3600, show_spinner="Reading the document...")
+def parse_document(digest: str, path: str) -> ParsedDocument:
+    """Parse a PDF once per content hash, shared by reruns and sessions."""
+    with PDF_LOCK:
+        doc = pymupdf.open(path)
+        try:
+            blocks = build_block_index(doc, workers=pdf_workers(load_config()))
+            return ParsedDocument(doc.page_count, blocks)
+        finally:
+            doc.close()
+
+
+def show_translation_summary(job: Job):
     """Show translation summary metrics."""
     st.markdown("### Translation Summary")
     col1, col2, col3 = st.columns(3)
     with col1:
-        st.metric("Pages Translated", f"{start_page}-{end_page}")
+        st.metric("Pages Translated", f"{job.start_page}-{job.end_page}")
     with col2:
-        st.metric("Source Language", src_lang.split()[0])
+        st.metric("Source Language", job.src_lang.split()[0])
     with col3:
-        st.metric("Target Language", tgt_lang.split()[0])
+        st.metric("Target Language", job.tgt_lang.split()[0])
+
+    stats = job.stats or {}
+    if stats.get("skipped"):
+        st.metric("Blocks Left As Is", stats["skipped"])
+    if stats.get("render_seconds_per_page"):
+        st.metric("Render Time per Page", f"{stats['render_seconds_per_page']:.2f}s")
+    if stats.get("first_page_seconds"):
+        st.metric("Time to First Page", f"{stats['first_page_seconds']:.1f}s")
+    if "mean_ttft" in stats:
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("Time to First Token", f"{stats['mean_ttft']:.2f}s")
+        with col2:
+            st.metric("Mean Request Latency", f"{stats['mean_latency']:.2f}s")
 
-    with open("output.pdf", "rb") as pdf_file:
+    with open(job.output_path, "rb") as pdf_file:
         pdf_bytes = pdf_file.read()
 
     # Download button
@@ -111,6 +153,91 @@ def show_translation_summary(pdf_file, start_page, end_page, src_lang, tgt_lang)
         file_name="output.pdf",
         mime="application/pdf",
     )
+    if job.trace_path.exists():
+        st.download_button(
+            label="Download Trace",
+            data=job.trace_path.read_bytes(),
+            file_name="trace.json",
+            mime="application/json",
+        )
+
+
+def show_preview(placeholder, job: Job):
+    """Show the text translated so far for the page being translated."""
+    page = job.preview_page
+    if page is None:
+        return
+    texts = job.preview.get(page, {})
+    text = "\n\n".join(texts[idx] for idx in sorted(texts))
+    # Drop the segment markers of batched requests
+    text = re.sub(r"<<\d+>>", "", text).strip()
+    with placeholder.container():
+        st.caption(f"Live preview of page {page}")
+        st.text(text)
+
+
+def show_ready_page(placeholder, job: Job):
+    """Show the page asked for once translated, or else the last one finished."""
+    ready = list(job.ready_pages)
+    if not ready:
+        return
+    page = job.priority_page if job.priority_page in ready else ready[-1]
+    total = job.end_page - job.start_page + 1
+    with placeholder.container():
+        st.caption(f"Page {page} translated, {len(ready)} of {total} pages ready")
+        st.image(str(job.page_preview_path(page)))
+
+
+def show_partial_download(job: Job):
+    """Offer the pages translated so far while the job continues."""
+    if not job.ready_pages:
+        return
+    # The output is written incrementally under the PDF lock
+    with PDF_LOCK:
+        pdf_bytes = job.output_path.read_bytes()
+    st.download_button(
+        label=f"Download the {len(job.ready_pages)} pages translated so far",
+        data=pdf_bytes,
+        file_name="output-partial.pdf",
+        mime="application/pdf",
+    )
+
+
+def show_job(job_id: str):
+    """Poll a translation job until it finishes, then show its result."""
+    job = get_job_manager().get(job_id)
+    if job is None:
+        st.warning("This translation job has expired, please translate again.")
+        return
+
+    if not job.done:
+        show_partial_download(job)
+        had_pages = bool(job.ready_pages)
+        progress_bar = st.progress(job.progress)
+        page_view = st.empty()
+        preview = st.empty()
+        shown = None
+        with st.spinner("🔄 Translating your document..."):
+            while not job.done:
+                if job.ready_pages and not had_pages:
+                    # Rerun to offer the first pages for download
+                    st.rerun()
+                progress_bar.progress(job.progress)
+                if len(job.ready_pages) != shown:
+                    shown = len(job.ready_pages)
+                    show_ready_page(page_view, job)
+                show_preview(preview, job)
+                time.sleep(0.5)
+        progress_bar.empty()
+        page_view.empty()
+        preview.empty()
+
+    if job.status == "failed":
+        st.error(f"❌ Translation failed: {job.error}")
+        return
+
+    st.success("✅ Translation completed successfully!")
+    show_translation_summary(job)
 
 
 def show_instructions():
@@ -134,12 +261,12 @@ def main():
     )
 
     if uploaded_pdf:
-        # Save to a temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as pdf_file:
-            pdf_file.write(uploaded_pdf.read())
+        # Write the upload to the job directory once, named by its hash
+        pdf_path = spool_upload(uploaded_pdf)
+        parsed = parse_document(pdf_path.stem, str(pdf_path))
 
         # Show file info
-        file_size_mb = len(uploaded_pdf.getvalue()) / (1024 * 1024)
+        file_size_mb = uploaded_pdf.size / (1024 * 1024)
         st.info(
             f"📄 **{uploaded_pdf.name}** ({file_size_mb:.2f} MB) loaded successfully!"
         )
@@ -155,8 +282,8 @@ def main():
                 "To", options=COMMON_LANGUAGES, index=1, key="tgt_lang"
             )
 
-        # Get page count and set up page selection
-        page_count = get_page_count(pdf_file)
+        # Set up page selection
+        page_count = parsed.page_count
 
         if page_count:
             st.markdown(f"**Document has {page_count} pages**")
@@ -183,39 +310,56 @@ def main():
             with pcol2:
                 end_page = st.number_input("Pages to", min_value=1, value=1, step=1)
 
+        # Translate pages progressively, from the page asked for first,
+        # by default only when ``streaming`` is set in the config
+        progressive = st.checkbox(
+            "Show pages as they are translated",
+            value=config_flag(load_config().get("streaming", False)),
+            help="Translated pages can be viewed and downloaded while the rest of the document is translated.",
+        )
+        priority_page = None
+        if progressive:
+            priority_page = st.number_input(
+                "Start with page",
+                min_value=1,
+                value=int(start_page),
+                step=1,
+                help="Translated first, followed by the pages after it and then those before it.",
+            )
+
         # Translation button and logic
         if st.button("🚀 Translate", type="primary", use_container_width=True):
             # Validate inputs
             errors = validate_inputs(
-                uploaded_pdf, src_lang, tgt_lang, start_page, end_page, page_count
+                uploaded_pdf,
+                src_lang,
+                tgt_lang,
+                start_page,
+                end_page,
+                page_count,
+                priority_page,
             )
 
             if errors:
                 for error in errors:
                     st.error(error)
             else:
-                # Perform translation with progress bar
-                progress_bar = st.progress(0)
-                with st.spinner("🔄 Translating your document..."):
-                    config = load_config()
-                    with open(pdf_file.name, "rb") as f:
-                        translate_pdf_preserve_layout(
-                            f,
-                            "output.pdf",
-                            config,
-                            src_lang,
-                            tgt_lang,
-                            start_page,
-                            end_page,
-                            progress_callback=progress_bar.progress,
-                        )
-
-                progress_bar.empty()
-                st.success("✅ Translation completed successfully!")
-
-                show_translation_summary(
-                    pdf_file, start_page, end_page, src_lang, tgt_lang
+                # Queue the translation on the shared worker pool
+                config = load_config()
+                config["streaming"] = progressive
+                st.session_state["job_id"] = get_job_manager().submit(
+                    pdf_path,
+                    config,
+                    src_lang,
+                    tgt_lang,
+                    start_page,
+                    end_page,
+                    index=parsed.blocks,
+                    priority_page=priority_page,
                 )
+
+        if "job_id" in st.session_state:
+            show_job(st.session_state["job_id"])
     else:
         # Show instructions when no file uploaded
         show_instructions()
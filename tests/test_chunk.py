@@ -0,0 +1,44 @@
+from core.chunk import join_pieces, pack_texts, split_chunks, split_text
+from core.prompt import count_tokens
+
+TEXT = " ".join(
+    f"Sentence {idx} describes one step of the training procedure." for idx in range(40)
+)
+
+
+def test_short_text_is_not_split():
+    assert split_text("A short sentence.", 100) == ["A short sentence."]
+    assert split_text(TEXT, 0) == [TEXT]
+
+
+def test_text_is_split_at_sentence_boundaries_within_budget():
+    pieces = split_text(TEXT, 40)
+    assert len(pieces) > 1
+    assert all(count_tokens(piece) <= 40 for piece in pieces)
+    assert all(piece.endswith(".") for piece in pieces)
+    assert " ".join(pieces).split() == TEXT.split()
+
+
+def test_long_sentence_is_split_between_words():
+    sentence = " ".join(["word"] * 200)
+    pieces = split_text(sentence, 20)
+    assert len(pieces) > 1
+    assert all(count_tokens(piece) <= 20 for piece in pieces)
+    assert " ".join(pieces).split() == sentence.split()
+
+
+def test_pack_texts_joins_small_texts_and_keeps_large_ones_alone():
+    assert pack_texts(["one", "two"], 100) == ["one\n\ntwo"]
+    large = "x" * 400
+    assert pack_texts(["one", large, "two"], 10) == ["one", large, "two"]
+
+
+def test_split_pieces_join_back_into_their_chunks():
+    chunks = ["Short chunk.", TEXT, "Another short chunk."]
+    pieces, owners = split_chunks(chunks, 40)
+    assert len(pieces) > len(chunks)
+    assert owners == sorted(owners)
+    assert set(owners) == {0, 1, 2}
+
+    joined = join_pieces(pieces, owners, len(chunks))
+    assert [chunk.split() for chunk in joined] == [chunk.split() for chunk in chunks]
@@ -0,0 +1,47 @@
+from core.classify import is_code, skip_reason
+
+
+def test_prose_list_with_semicolons_is_not_code():
+    text = "Inputs: the raw image;\nOutputs: the predicted mask;"
+    assert not is_code(text)
+    assert skip_reason(text, "Persian فارسی", "English") is None
+
+
+def test_bullet_list_with_semicolons_is_not_code():
+    text = (
+        "• the encoder reads the source sentence;\n"
+        "• the decoder attends to the encoder states;\n"
+        "• the output layer predicts the next token."
+    )
+    assert not is_code(text)
+    assert skip_reason(text, "Persian فارسی", "English") is None
+
+
+def test_prose_headers_ending_in_colon_are_not_code():
+    text = "Training (first stage):\nFine-tuning (second stage):"
+    assert not is_code(text)
+
+
+def test_code_is_detected():
+    assert is_code("x = compute(a, b);\nreturn x;")
+    assert is_code("def forward(self, x):\n    return self.layer(x)")
+    assert is_code("import numpy as np\nx = np.zeros(3)")
+
+
+def test_monospace_hint_marks_single_pattern_code():
+    text = "do_something();\ndo_more();"
+    assert not is_code("first step;\nsecond step;")
+    assert is_code(text, monospace=True)
+    assert skip_reason(text, "Persian", "English", monospace=True) == "code"
+
+
+def test_target_language_text_is_skipped():
+    assert skip_reason("این متن فارسی است", "Persian فارسی", "English") == (
+        "target_language"
+    )
+
+
+def test_source_sharing_target_script_is_translated():
+    assert skip_reason("هذه جملة باللغة العربية", "Persian فارسی", "Arabic") is None
+    assert skip_reason("Это предложение на русском", "Ukrainian", "Russian") is None
+    assert skip_reason("这是一个中文句子", "Japanese", "Chinese") is None
@@ -0,0 +1,34 @@
+from core.glossary import TermIndex
+
+GLOSSARY = {
+    "attention": "توجه",
+    "self-attention": "خودتوجهی",
+    "learning rate": "نرخ یادگیری",
+    "GAN": "شبکه مولد تخاصمی",
+}
+
+
+def test_terms_are_matched_case_insensitively():
+    index = TermIndex(GLOSSARY)
+    assert index.find("The Learning Rate decays.") == {"learning rate": "نرخ یادگیری"}
+    assert index.find("A gan generates images.") == {"GAN": "شبکه مولد تخاصمی"}
+
+
+def test_terms_are_matched_on_word_boundaries_only():
+    index = TermIndex(GLOSSARY)
+    assert index.find("Organic compounds") == {}
+    assert index.find("inattentional blindness") == {}
+    assert index.find("(GAN)") == {"GAN": "شبکه مولد تخاصمی"}
+
+
+def test_overlapping_terms_are_all_found():
+    index = TermIndex(GLOSSARY)
+    assert index.find("Self-attention layers") == {
+        "self-attention": "خودتوجهی",
+        "attention": "توجه",
+    }
+
+
+def test_text_without_terms_finds_nothing():
+    assert TermIndex(GLOSSARY).find("Nothing to see here.") == {}
+    assert TermIndex({}).find("attention") == {}
@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+
+from core.client.limiter import AdaptiveConcurrency, EndpointLimiter
+
+CONFIG = {"max_retries": 2, "retry_base_delay": 0}
+
+
+def failing(errors: list[Exception]):
+    """A call raising ``errors`` in turn, then returning "ok"."""
+
+    calls = []
+
+    def fn():
+        calls.append(None)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return "ok"
+
+    return fn, calls
+
+
+def test_retryable_errors_are_retried():
+    limiter = EndpointLimiter(CONFIG)
+    fn, calls = failing([ConnectionError(), TimeoutError()])
+    assert limiter.call(fn) == "ok"
+    assert len(calls) == 3
+    assert limiter.retries == 2
+    assert limiter.concurrency.in_flight == 0
+
+
+def test_retries_stop_after_max_retries():
+    limiter = EndpointLimiter(CONFIG)
+    fn, calls = failing([ConnectionError()] * 3)
+    with pytest.raises(ConnectionError):
+        limiter.call(fn)
+    assert len(calls) == 3
+    assert limiter.concurrency.in_flight == 0
+
+
+def test_other_errors_are_not_retried():
+    limiter = EndpointLimiter(CONFIG)
+    fn, calls = failing([ValueError()])
+    with pytest.raises(ValueError):
+        limiter.call(fn)
+    assert len(calls) == 1
+    assert limiter.retries == 0
+
+
+def test_async_calls_are_retried():
+    limiter = EndpointLimiter(CONFIG)
+    fn, calls = failing([ConnectionError()])
+
+    async def afn():
+        return fn()
+
+    assert asyncio.run(limiter.acall(afn)) == "ok"
+    assert len(calls) == 2
+
+
+def test_limit_grows_additively_on_success():
+    concurrency = AdaptiveConcurrency(initial=4)
+    concurrency.acquire()
+    concurrency.release(latency=1.0)
+    assert concurrency.limit == 4.25
+    assert concurrency.in_flight == 0
+
+
+def test_limit_halves_on_error_and_latency_spike():
+    concurrency = AdaptiveConcurrency(initial=16, cooldown=0)
+    concurrency.acquire()
+    concurrency.release(error=True)
+    assert concurrency.limit == 8
+
+    concurrency.acquire()
+    concurrency.release(latency=1.0)
+    concurrency.acquire()
+    concurrency.release(latency=10.0)
+    assert concurrency.limit == (8 + 1 / 8) / 2
+
+
+def test_limit_halves_at_most_once_per_cooldown():
+    concurrency = AdaptiveConcurrency(initial=16, cooldown=60)
+    for _ in range(3):
+        concurrency.acquire()
+        concurrency.release(error=True)
+    assert concurrency.limit == 8
+
+
+def test_limit_stays_within_bounds():
+    concurrency = AdaptiveConcurrency(initial=2, minimum=1, maximum=2, cooldown=0)
+    for _ in range(3):
+        concurrency.acquire()
+        concurrency.release(error=True)
+    assert concurrency.limit == 1
+    for _ in range(10):
+        concurrency.acquire()
+        concurrency.release(latency=1.0)
+    assert concurrency.limit == 2
+
+
+def test_async_waiters_get_released_slots():
+    concurrency = AdaptiveConcurrency(initial=2)
+    peak = 0
+
+    async def request():
+        nonlocal peak
+        await concurrency.aacquire()
+        peak = max(peak, concurrency.in_flight)
+        await asyncio.sleep(0.001)
+        concurrency.release()
+
+    async def main():
+        await asyncio.wait_for(asyncio.gather(*(request() for _ in range(20))), 5)
+
+    asyncio.run(main())
+    assert peak == 2
+    assert concurrency.in_flight == 0
@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+from core.client.base import BaseClient
+from core.client.router import RouterClient
+
+
+class FakeClient(BaseClient):
+    """Answers with its name, or raises ``error`` when set."""
+
+    def __init__(self, base_url: str, error: Exception | None = None, healthy=True):
+        super().__init__(model="fake", base_url=base_url)
+        self.error = error
+        self.healthy = healthy
+        self.calls = 0
+
+    def ask(self, prompt: str) -> str:
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return self.base_url
+
+    def ping(self) -> bool:
+        return self.healthy
+
+
+# Endpoint health is shared by base_url, so each test uses its own
+def test_retryable_errors_fail_over():
+    down = FakeClient("http://failover-down", ConnectionError())
+    up = FakeClient("http://failover-up")
+    router = RouterClient([down, up])
+    for _ in range(3):
+        assert router.ask("prompt") == "http://failover-up"
+    assert down.calls >= 1
+    assert router.failovers == down.calls
+
+
+def test_async_requests_fail_over():
+    down = FakeClient("http://afailover-down", ConnectionError())
+    up = FakeClient("http://afailover-up")
+    router = RouterClient([down, up])
+    for _ in range(3):
+        assert asyncio.run(router.aask("prompt")) == "http://afailover-up"
+    assert router.failovers == down.calls
+
+
+def test_other_errors_do_not_fail_over():
+    broken = FakeClient("http://nofailover-a", ValueError())
+    other = FakeClient("http://nofailover-b", ValueError())
+    router = RouterClient([broken, other])
+    with pytest.raises(ValueError):
+        router.ask("prompt")
+    assert broken.calls + other.calls == 1
+
+
+def test_last_error_is_raised_when_every_endpoint_fails():
+    router = RouterClient(
+        [
+            FakeClient("http://allfail-a", ConnectionError("first")),
+            FakeClient("http://allfail-b", ConnectionError("last")),
+        ]
+    )
+    with pytest.raises(ConnectionError, match="last"):
+        router.ask("prompt")
+    assert router.failovers == 2
+
+
+def test_failing_endpoint_is_taken_out_of_rotation():
+    down = FakeClient("http://rotation-down", ConnectionError())
+    up = FakeClient("http://rotation-up")
+    router = RouterClient([down, up], max_failures=2, cooldown=60)
+    for _ in range(5):
+        router.ask("prompt")
+    assert down.calls == 2
+
+
+def test_no_healthy_endpoint_raises_connection_error():
+    clients = [
+        FakeClient("http://exhausted-a", healthy=False),
+        FakeClient("http://exhausted-b", healthy=False),
+    ]
+    router = RouterClient(clients, max_failures=1, cooldown=0)
+    for endpoint in router.endpoints:
+        endpoint.failures = 1
+
+    with pytest.raises(ConnectionError, match="No healthy endpoint"):
+        router.ask("prompt")
+    with pytest.raises(ConnectionError, match="No healthy endpoint"):
+        asyncio.run(router.aask("prompt"))
+    assert all(client.calls == 0 for client in clients)
+
+
+def test_recovered_endpoint_is_probed_back_into_rotation():
+    client = FakeClient("http://probe-a")
+    router = RouterClient([client], max_failures=1, cooldown=0)
+    router.endpoints[0].failures = 1
+    assert router.ask("prompt") == "http://probe-a"
+    assert router.endpoints[0].failures == 0
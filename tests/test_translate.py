@@ -0,0 +1,128 @@
+import pytest
+
+from bench.server import MockServer
+from core.checkpoint import Checkpoint
+from core.client.base import BaseClient
+from core.client.factory import create_client
+from core.translate import (
+    pack_batches,
+    pack_context_batches,
+    page_windows,
+    split_batch_response,
+    translate_blocks,
+)
+
+CHUNKS = [f"Paragraph {idx} of the document." for idx in range(6)]
+
+
+def mock_client(server: MockServer) -> BaseClient:
+    return create_client({"base_url": server.url, "model": "bench", "max_retries": 0})
+
+
+def test_batch_response_is_split_at_markers():
+    resp = "Here you go:\n<<1>>\nیک\n<<2>>\n  دو  \n"
+    assert split_batch_response(resp, 2) == ["یک", "دو"]
+
+
+def test_malformed_batch_response_is_rejected():
+    assert split_batch_response("<<1>>\nیک", 2) is None
+    assert split_batch_response("<<1>>\nیک\n<<3>>\nسه", 2) is None
+    assert split_batch_response("<<1>>\n\n<<2>>\nدو", 2) is None
+    assert split_batch_response("یک دو", 1) is None
+
+
+def test_batches_respect_the_token_budget():
+    chunks = ["short"] * 4 + ["long " * 200]
+    assert pack_batches(chunks, 0) == [[0], [1], [2], [3], [4]]
+    assert sorted(pack_batches(chunks, 100)) == [[0, 1, 2, 3], [4]]
+
+
+def test_only_chunks_with_the_same_context_share_a_batch():
+    summaries = ["a", "b", "a", "b", "c"]
+    batches = pack_context_batches(["x"] * 5, summaries, 100)
+    assert sorted(batches) == [[0, 2], [1, 3], [4]]
+
+
+def test_windows_start_at_the_priority_page_and_wrap_around():
+    assert page_windows(0, 9, 4) == [(0, 3), (4, 7), (8, 9)]
+    assert page_windows(0, 9, 4, priority=5) == [(5, 8), (9, 9), (0, 3), (4, 4)]
+    assert page_windows(0, 9, 4, priority=20) == [(9, 9), (0, 3), (4, 7), (8, 8)]
+
+
+def test_first_window_holds_priority_size_pages():
+    assert page_windows(0, 9, 4, priority=5, priority_size=1) == [
+        (5, 5),
+        (6, 9),
+        (0, 3),
+        (4, 4),
+    ]
+
+
+def test_batched_chunks_are_translated_in_one_request():
+    server = MockServer()
+    server.start()
+    try:
+        translations = translate_blocks(
+            CHUNKS + CHUNKS[:2],
+            "summary",
+            "English",
+            "Persian",
+            mock_client(server),
+            batch_tokens=1000,
+        )
+        assert server.stats.snapshot()["requests"] == 1
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert len(translations) == len(CHUNKS) + 2
+    assert all(translation.startswith("ترجمه") for translation in translations)
+    assert translations[:2] == translations[-2:]
+
+
+class FailingClient(BaseClient):
+    """Answers every prompt but those mentioning ``failing``."""
+
+    def __init__(self, failing: str):
+        super().__init__(model="bench", base_url="http://failing")
+        self.failing = failing
+
+    def ask(self, prompt: str) -> str:
+        if self.failing in prompt:
+            raise ConnectionError("endpoint went away")
+        return "ترجمه"
+
+
+def test_rerun_resumes_from_checkpoint(tmp_path):
+    path = tmp_path / "job.db"
+    checkpoint = Checkpoint(path)
+    with pytest.raises(ConnectionError):
+        translate_blocks(
+            CHUNKS,
+            "summary",
+            "English",
+            "Persian",
+            FailingClient(CHUNKS[-1]),
+            checkpoint=checkpoint,
+        )
+    checkpoint.close()
+
+    server = MockServer()
+    server.start()
+    checkpoint = Checkpoint(path)
+    try:
+        translations = translate_blocks(
+            CHUNKS,
+            "summary",
+            "English",
+            "Persian",
+            mock_client(server),
+            checkpoint=checkpoint,
+        )
+        # Only the chunk that failed is sent again
+        assert server.stats.snapshot()["requests"] == 1
+    finally:
+        checkpoint.close()
+        server.shutdown()
+        server.server_close()
+    assert checkpoint.resumed == len(CHUNKS) - 1
+    assert all(translations)